@@ -0,0 +1,561 @@
+"""
+Offline benchmark of script0, script1 and script2.
+
+A local stand-in for github.com serves listing pages for every parser key of
+script0 (user and organization repositories, the five kinds of search
+results), with "Next" links, a rate limit page every few requests and
+synthetic zip archives of controlled sizes. The three scripts then run one
+after another against it, each in its own process inside a scratch copy of
+this folder, so outputs/ and RepoDownloads/ of the real project are never
+touched and nothing goes to the network.
+
+    python benchmark.py
+
+Reports pages/s, repos/s, MB/s and the peak RSS of every stage, and appends
+the results to outputs/benchmark_results.jsonl with the current commit, so
+runs on different commits can be compared. Parameters are at the bottom of
+this file.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import pathlib
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+BASE_DIR = pathlib.Path(__file__).parent.resolve()
+
+
+class StandInGitHub:
+    # Serves a generated GitHub: every seed has pages_per_seed listing pages of
+    # links_per_page repositories, no repository is listed twice
+    owner = "bench-owner"
+    search_types = ["repositories", "issues", "discussions", "wikis", "commits"]
+    words = (
+        "import return self def class value result data path file name link "
+        "page repository download archive worker queue thread request"
+    ).split()
+
+    def __init__(
+        self,
+        pages_per_seed=3,
+        links_per_page=10,
+        archive_sizes=(16384, 131072, 1048576),
+        files_per_archive=8,
+        rate_limit_every=25,
+    ):
+        self.pages_per_seed = pages_per_seed
+        self.links_per_page = links_per_page
+        self.archive_sizes = archive_sizes
+        self.files_per_archive = files_per_archive
+        self.rate_limit_every = rate_limit_every
+
+        self.seed_paths = ["/bench-user", "/orgs/bench-org/repositories"] + [
+            f"/search?q=bench&type={search_type}"
+            for search_type in StandInGitHub.search_types
+        ]
+        self.archives = {}
+        self.lock = threading.Lock()
+        self.listing_requests = 0
+        self.rate_limited = 0
+        self.server = None
+        self.base_url = None
+
+    @property
+    def total_repositories(self):
+        return len(self.seed_paths) * self.pages_per_seed * self.links_per_page
+
+    def get_repository(self, seed_number, page, position):
+        number = (
+            seed_number * self.pages_per_seed + page - 1
+        ) * self.links_per_page + position
+        return f"{StandInGitHub.owner}/repo-{number}"
+
+    def build_archives(self):
+        # Done before the clock starts, the zips are served from memory
+        for seed_number in range(len(self.seed_paths)):
+            for page in range(1, self.pages_per_seed + 1):
+                for position in range(self.links_per_page):
+                    repository = self.get_repository(seed_number, page, position)
+                    size = self.archive_sizes[len(self.archives) % len(self.archive_sizes)]
+                    self.archives[repository] = self.build_archive(repository, size)
+
+    def build_archive(self, repository, size):
+        # Text files add up to size bytes uncompressed, the LICENSE is the
+        # same in every archive like in real corpora
+        rng = random.Random(repository)
+        top_folder = repository.split("/")[-1] + "-HEAD"
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(f"{top_folder}/", "")
+            archive.writestr(f"{top_folder}/LICENSE", "MIT License\n" * 80)
+            file_size = max(1, size // self.files_per_archive)
+            for number in range(self.files_per_archive):
+                words = []
+                length = 0
+                while length < file_size:
+                    word = rng.choice(StandInGitHub.words)
+                    words.append(word)
+                    length += len(word) + 1
+                archive.writestr(
+                    f"{top_folder}/src/module_{number}.py", " ".join(words)[:file_size]
+                )
+        return buffer.getvalue()
+
+    def render_links(self, seed_path, links):
+        search_type = parse_qs(urlsplit(seed_path).query).get("type", [None])[0]
+        if seed_path == "/bench-user":
+            items = "".join(
+                f'<li><div><div><h3><a href="/{link}">{link}</a></h3></div></div></li>'
+                for link in links
+            )
+            return f'<div id="user-repositories-list"><ul>{items}</ul></div>'
+        if seed_path.startswith("/orgs/"):
+            items = "".join(
+                f'<li><div><div><div><h3><a href="/{link}">{link}</a></h3></div></div></div></li>'
+                for link in links
+            )
+            return f'<div id="org-repositories"><div><ul>{items}</ul></div></div>'
+        if search_type == "repositories":
+            return "".join(
+                f'<div class="search-title"><a href="/{link}">{link}</a></div>'
+                for link in links
+            )
+        if search_type == "issues":
+            items = "".join(
+                f'<div><h3><div>issue</div><div><a href="/{link}/issues/1">{link}</a></div></h3></div>'
+                for link in links
+            )
+            return f'<div data-testid="results-list">{items}</div>'
+        if search_type == "discussions":
+            items = "".join(
+                f'<div><div><div><a href="/{link}/discussions">{link}</a></div></div></div>'
+                for link in links
+            )
+            return f'<div id="discussion_search_results"><div>{items}</div></div>'
+        if search_type == "wikis":
+            items = "".join(
+                f'<div><a href="/{link}">{link}</a></div>' for link in links
+            )
+            return f'<div id="wiki_search_results"><div>{items}</div></div>'
+        items = "".join(
+            f'<div><div><div><a href="/{link}">{link}</a></div></div></div>'
+            for link in links
+        )
+        return f'<div id="commit_search_results">{items}</div>'
+
+    @staticmethod
+    def get_page_url(seed_path, page):
+        if seed_path == "/bench-user":
+            return f"{seed_path}?tab=repositories&page={page}"
+        if seed_path.startswith("/orgs/"):
+            return f"{seed_path}?page={page}"
+        return f"{seed_path}&p={page}"
+
+    def render_listing(self, path, query):
+        # None for urls that are not a listing page
+        seed_path = path
+        if path == "/search":
+            search_type = query.get("type", ["repositories"])[0]
+            seed_path = f"/search?q=bench&type={search_type}"
+        if seed_path not in self.seed_paths:
+            return None
+
+        if seed_path == "/bench-user" and "tab" not in query:
+            # Profile page, only links to the repositories tab
+            return (
+                '<html><head><title>bench-user</title></head><body><nav>'
+                '<a data-tab-item="repositories" href="/bench-user?tab=repositories">'
+                "Repositories</a></nav></body></html>"
+            )
+
+        page = int(query.get("page", query.get("p", ["1"]))[0])
+        seed_number = self.seed_paths.index(seed_path)
+        links = [
+            self.get_repository(seed_number, page, position)
+            for position in range(self.links_per_page)
+        ]
+        body = self.render_links(seed_path, links)
+        if seed_path.startswith("/orgs/"):
+            body = (
+                '<div data-tab-item="org-header-repositories-tab">'
+                f'<a href="{seed_path}">Repositories</a></div>' + body
+            )
+        if page < self.pages_per_seed:
+            next_url = StandInGitHub.get_page_url(seed_path, page + 1)
+            body += f'<a class="next_page" href="{next_url}">Next</a>'
+        return f"<html><head><title>bench</title></head><body>{body}</body></html>"
+
+    def handle(self, url, if_none_match=None):
+        # Returns (status, content type, body, ETag)
+        parts = urlsplit(url)
+        path = parts.path.rstrip("/") or "/"
+        query = parse_qs(parts.query)
+
+        if path.endswith("/archive/HEAD.zip"):
+            archive = self.archives.get(path[1 : -len("/archive/HEAD.zip")])
+            if archive is None:
+                return 404, "text/plain", b"Not Found", None
+            etag = f'"{hashlib.sha1(archive).hexdigest()}"'
+            if if_none_match == etag:
+                return 304, "application/zip", b"", etag
+            return 200, "application/zip", archive, etag
+
+        page = self.render_listing(path, query)
+        if page is None:
+            return 404, "text/plain", b"Not Found", None
+
+        with self.lock:
+            self.listing_requests += 1
+            rate_limited = (
+                self.rate_limit_every
+                and self.listing_requests % self.rate_limit_every == 0
+            )
+            if rate_limited:
+                self.rate_limited += 1
+        if rate_limited:
+            page = "<html><head><title>Rate limit · GitHub</title></head><body></body></html>"
+        return 200, "text/html; charset=utf-8", page.encode(), None
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, content_type, body, etag = stand_in.handle(
+                    self.path, self.headers.get("If-None-Match")
+                )
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Benchmark:
+    # refresh is script1 again in refresh mode, nothing has changed
+    stages = ["script0", "script1", "script2", "refresh"]
+    metrics_files = {
+        "script0": "metrics_scraping.json",
+        "script1": "metrics_downloading.json",
+        "script2": "metrics_unzip.json",
+        "refresh": "metrics_refresh.json",
+    }
+    results_path = BASE_DIR / "outputs/benchmark_results.jsonl"
+
+    def __init__(
+        self,
+        stand_in,
+        crawler_workers=2,
+        download_workers=4,
+        unzip_workers=2,
+        keep_workdir=False,
+    ):
+        self.stand_in = stand_in
+        self.workers = {
+            "script0": crawler_workers,
+            "script1": download_workers,
+            "script2": unzip_workers,
+            "refresh": download_workers,
+        }
+        self.keep_workdir = keep_workdir
+        self.workdir = None
+
+    def prepare_workdir(self):
+        # A copy of the scripts, so BASE_DIR and every output path point here
+        self.workdir = pathlib.Path(tempfile.mkdtemp(prefix="github-scraper-bench-"))
+        for file_path in glob.glob(str(BASE_DIR / "*.py")):
+            shutil.copy(file_path, self.workdir)
+        os.mkdir(self.workdir / "outputs")
+        os.mkdir(self.workdir / "RepoDownloads")
+
+    def run_stage(self, stage):
+        arguments = {
+            "base_url": self.stand_in.base_url,
+            "seeds": [self.stand_in.base_url + path for path in self.stand_in.seed_paths],
+            "workers": self.workers[stage],
+        }
+        log_path = self.workdir / "outputs" / f"benchmark_{stage}.log"
+        started_at = time.perf_counter()
+        with open(log_path, "w") as log_file:
+            process = subprocess.Popen(
+                [sys.executable, "benchmark.py", "stage", stage, json.dumps(arguments)],
+                cwd=self.workdir,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+            )
+            # wait4 gives the peak RSS of this stage only, worker processes included
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        seconds = time.perf_counter() - started_at
+
+        if process.returncode != 0:
+            with open(log_path) as log_file:
+                print("".join(log_file.readlines()[-20:]))
+            raise RuntimeError(f"{stage} exited with {process.returncode}")
+
+        with open(self.workdir / "outputs" / Benchmark.metrics_files[stage]) as file:
+            metrics = json.load(file)
+        # Rates use the time the stage ran, not the interpreter start and imports
+        return {
+            "seconds": metrics["uptime_seconds"],
+            "process_seconds": round(seconds, 3),
+            "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+            "counters": {
+                name: counter["total"] for name, counter in metrics["counters"].items()
+            },
+        }
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=BASE_DIR,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        except OSError:
+            return None
+
+    def run(self):
+        self.stand_in.build_archives()
+        self.stand_in.start()
+        self.prepare_workdir()
+        try:
+            stages = {stage: self.run_stage(stage) for stage in Benchmark.stages}
+        finally:
+            self.stand_in.stop()
+            if not self.keep_workdir:
+                shutil.rmtree(self.workdir, ignore_errors=True)
+
+        crawl = stages["script0"]
+        download = stages["script1"]
+        unzip = stages["script2"]
+        crawl["pages_per_second"] = round(
+            crawl["counters"].get("crawl_pages", 0) / crawl["seconds"], 2
+        )
+        crawl["links_per_second"] = round(
+            crawl["counters"].get("crawl_links", 0) / crawl["seconds"], 2
+        )
+        download["repos_per_second"] = round(
+            download["counters"].get("download_repos", 0) / download["seconds"], 2
+        )
+        download["mb_per_second"] = round(
+            download["counters"].get("download_bytes", 0) / download["seconds"] / 1e6, 2
+        )
+        unzip["repos_per_second"] = round(
+            unzip["counters"].get("unzip_archives", 0) / unzip["seconds"], 2
+        )
+        unzip["mb_per_second"] = round(
+            unzip["counters"].get("unzip_bytes", 0) / unzip["seconds"] / 1e6, 2
+        )
+        refresh = stages["refresh"]
+        refresh["repos_per_second"] = round(
+            refresh["counters"].get("download_unchanged", 0) / refresh["seconds"], 2
+        )
+        refresh["mb_per_second"] = round(
+            refresh["counters"].get("download_bytes", 0) / refresh["seconds"] / 1e6, 2
+        )
+
+        result = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": Benchmark.get_commit(),
+            "repositories": self.stand_in.total_repositories,
+            "rate_limit_pages": self.stand_in.rate_limited,
+            "workers": self.workers,
+            "stages": stages,
+        }
+        os.makedirs(Benchmark.results_path.parent, exist_ok=True)
+        with open(Benchmark.results_path, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        return result
+
+    @staticmethod
+    def print_report(result):
+        stages = result["stages"]
+        expected = result["repositories"]
+        print(f"\nBenchmark of {result['commit']} with {expected} repositories")
+        print(
+            f"{'stage':<10}{'seconds':>10}{'process s':>12}{'rate':>24}"
+            f"{'MB/s':>10}{'peak RSS MB':>14}"
+        )
+        rows = [("script0", f"{stages['script0']['pages_per_second']} pages/s", "-")]
+        for stage in ["script1", "script2", "refresh"]:
+            rate = f"{stages[stage]['repos_per_second']} repos/s"
+            rows.append((stage, rate, stages[stage]["mb_per_second"]))
+        for stage, rate, mb_per_second in rows:
+            print(
+                f"{stage:<10}{stages[stage]['seconds']:>10}"
+                f"{stages[stage]['process_seconds']:>12}{rate:>24}"
+                f"{mb_per_second:>10}{stages[stage]['peak_rss_mb']:>14}"
+            )
+
+        # A faster run that lost repositories is not faster
+        done = {
+            "collected": stages["script0"]["counters"].get("crawl_links", 0),
+            "downloaded": stages["script1"]["counters"].get("download_repos", 0),
+            "unzipped": stages["script2"]["counters"].get("unzip_archives", 0),
+            "unchanged on refresh": stages["refresh"]["counters"].get(
+                "download_unchanged", 0
+            ),
+        }
+        for name, count in done.items():
+            if count != expected:
+                print(f"WARNING: {name} {count} of {expected} repositories")
+        print(f"Results appended to {Benchmark.results_path}")
+
+
+class Stage:
+    # Runs inside the scratch copy, started by Benchmark.run_stage. The rate
+    # limiter only keeps the ban handling in the loop, the stand-in has no
+    # request limit to respect.
+    @staticmethod
+    def get_rate_limiter():
+        from rate_limiter import AdaptiveRateLimiter
+
+        return AdaptiveRateLimiter(
+            rate=1000, max_rate=1000, burst=50, backoff=0.05, max_backoff=1
+        )
+
+    @staticmethod
+    def script0(arguments):
+        import script0
+        from browser import BrowserProfile
+        from metrics import Metrics
+
+        script0.GetGitHubLinks.github_domain = arguments["base_url"] + "/"
+        metrics = Metrics(snapshot_path=BASE_DIR / "outputs/metrics_scraping.json")
+        script0.ParallelGetGitHubLinks(
+            download_path=str(BASE_DIR / "RepoDownloads"),
+            total_links_to_download=None,
+            initial_links=arguments["seeds"],
+            banned_waiting_time=0.05,
+            workers=arguments["workers"],
+            use_http_fetcher=True,
+            rate_limiter=Stage.get_rate_limiter(),
+            browser_profile=BrowserProfile.lean(),
+            metrics=metrics,
+        ).run()
+        metrics.stop()
+
+    @staticmethod
+    def script1(arguments, refresh=False):
+        import script1
+        from browser import BrowserProfile
+        from metrics import Metrics
+
+        collected_links_path = BASE_DIR / "outputs/collected_links.txt"
+        downloaded_link_path = BASE_DIR / "outputs/downloaded_link.txt"
+        download_path = BASE_DIR / "RepoDownloads"
+        rate_limiter = Stage.get_rate_limiter()
+        metrics_file = "metrics_refresh.json" if refresh else "metrics_downloading.json"
+        metrics = Metrics(snapshot_path=BASE_DIR / "outputs" / metrics_file)
+        script1.CleanUp(downloaded_link_path)
+        if refresh:
+            links = script1.Utils.read_urls(file_path=collected_links_path)
+        else:
+            links = script1.Utils.get_starting_links(
+                collected_links_path=collected_links_path,
+                downloaded_link_path=downloaded_link_path,
+            )
+        script1.DownloadGitZips(
+            downloaded_link_path=downloaded_link_path,
+            download_path=download_path,
+            http_downloader=script1.HttpZipDownloader(
+                download_path=download_path,
+                pool_size=arguments["workers"],
+                rate_limiter=rate_limiter,
+                archive_versions=script1.ArchiveVersions(),
+            ),
+            workers=arguments["workers"],
+            rate_limiter=rate_limiter,
+            browser_profile=BrowserProfile.lean(),
+            metrics=metrics,
+            refresh=refresh,
+        ).run(links)
+        metrics.stop()
+
+    @staticmethod
+    def refresh(arguments):
+        Stage.script1(arguments, refresh=True)
+
+    @staticmethod
+    def script2(arguments):
+        import script2
+        from metrics import Metrics
+
+        metrics = Metrics(snapshot_path=BASE_DIR / "outputs/metrics_unzip.json")
+        script2.UnZip(
+            zips_input_path=BASE_DIR / "RepoDownloads", metrics=metrics
+        ).run(workers=arguments["workers"])
+        metrics.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "stage":
+        getattr(Stage, sys.argv[2])(json.loads(sys.argv[3]))
+        sys.exit(0)
+
+    # Size of the generated GitHub: 7 seeds (user, organization and the five
+    # search types) x pages_per_seed x links_per_page repositories
+    pages_per_seed = 3
+    links_per_page = 10
+
+    # Uncompressed bytes per archive, used in turn
+    archive_sizes = (16384, 131072, 1048576)
+    files_per_archive = 8
+
+    # Every n-th listing request gets the rate limit page, 0 never
+    rate_limit_every = 25
+
+    crawler_workers = 2
+    download_workers = 4
+    unzip_workers = os.cpu_count() or 1
+
+    # Keep the scratch copy with its outputs and logs for a closer look
+    keep_workdir = False
+
+    stand_in = StandInGitHub(
+        pages_per_seed=pages_per_seed,
+        links_per_page=links_per_page,
+        archive_sizes=archive_sizes,
+        files_per_archive=files_per_archive,
+        rate_limit_every=rate_limit_every,
+    )
+    result = Benchmark(
+        stand_in,
+        crawler_workers=crawler_workers,
+        download_workers=download_workers,
+        unzip_workers=unzip_workers,
+        keep_workdir=keep_workdir,
+    ).run()
+    Benchmark.print_report(result)
@@ -0,0 +1,182 @@
+from selenium import webdriver
+from selenium.common import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+class BrowserProfile:
+    # Chrome settings shared by script0 and script1. The default profile is
+    # the usual maximized, fully rendering browser. The lean profile runs
+    # headless, hands the page over at DOMContentLoaded ("eager") and never
+    # fetches images, media, fonts or analytics, the scripts only read and
+    # click a few anchors.
+    window_size = "1920,1080"
+    media_url_patterns = [
+        "*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.mov", "*.m3u8",
+    ]
+    font_url_patterns = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+    analytics_hosts = [
+        "collector.github.com",
+        "www.google-analytics.com",
+        "www.googletagmanager.com",
+        "stats.g.doubleclick.net",
+    ]
+    analytics_url_patterns = [
+        "*/_private/browser/stats*",
+        "*/_private/browser/errors*",
+    ]
+
+    def __init__(
+        self,
+        headless=False,
+        page_load_strategy="normal",
+        block_images=False,
+        block_media=False,
+        block_fonts=False,
+        block_analytics=False,
+    ):
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block_images = block_images
+        self.block_media = block_media
+        self.block_fonts = block_fonts
+        self.block_analytics = block_analytics
+
+    @classmethod
+    def lean(cls, headless=True):
+        return cls(
+            headless=headless,
+            page_load_strategy="eager",
+            block_images=True,
+            block_media=True,
+            block_fonts=True,
+            block_analytics=True,
+        )
+
+    def get_blocked_url_patterns(self):
+        patterns = []
+        if self.block_media:
+            patterns += BrowserProfile.media_url_patterns
+        if self.block_fonts:
+            patterns += BrowserProfile.font_url_patterns
+        if self.block_analytics:
+            patterns += BrowserProfile.analytics_url_patterns
+        return patterns
+
+    def get_options(self, download_path=None):
+        options = webdriver.ChromeOptions()
+        options.page_load_strategy = self.page_load_strategy
+
+        if self.headless:
+            options.add_argument("--headless=new")
+            # Maximizing does nothing without a screen, GitHub hides parts of
+            # its layout in small windows
+            options.add_argument(f"--window-size={BrowserProfile.window_size}")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--disable-dev-shm-usage")
+        else:
+            options.add_argument("--start-maximized")
+
+        prefs = {}
+        if download_path:
+            prefs["download.default_directory"] = download_path
+        if self.block_images:
+            prefs["profile.managed_default_content_settings.images"] = 2
+            options.add_argument("--blink-settings=imagesEnabled=false")
+        if self.block_media:
+            options.add_argument("--autoplay-policy=user-gesture-required")
+        if self.block_analytics:
+            # Browser wide, unlike the URL patterns which are set per tab
+            rules = ", ".join(
+                f"MAP {host} ~NOTFOUND" for host in BrowserProfile.analytics_hosts
+            )
+            options.add_argument(f"--host-resolver-rules={rules}")
+        if prefs:
+            options.add_experimental_option("prefs", prefs)
+        return options
+
+    def prepare_tab(self, wd):
+        # URL blocking lives in the DevTools session of a tab, so every new tab
+        # needs it before its first page load
+        patterns = self.get_blocked_url_patterns()
+        if not patterns:
+            return
+        try:
+            wd.execute_cdp_cmd("Network.enable", {})
+            wd.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except WebDriverException:
+            pass
+
+    def get_webdriver(self, download_path=None):
+        wd = webdriver.Chrome(
+            service=Service(ChromeDriverManager().install()),
+            options=self.get_options(download_path),
+        )
+        if self.headless and download_path:
+            # Older headless builds ignore the download preference
+            try:
+                wd.execute_cdp_cmd(
+                    "Browser.setDownloadBehavior",
+                    {"behavior": "allow", "downloadPath": download_path},
+                )
+            except WebDriverException:
+                pass
+        self.prepare_tab(wd)
+        return wd
+
+
+class TabPool:
+    # Long-lived tabs of one driver. Pages are loaded into a free tab in place
+    # instead of opening and closing a window per page, a tab is only replaced
+    # after max_uses page loads or when it broke.
+    max_uses = 100
+
+    def __init__(self, wd, browser_profile=None, max_uses=None):
+        self.wd = wd
+        self.browser_profile = browser_profile or BrowserProfile()
+        self.max_uses = max_uses or TabPool.max_uses
+        self.uses = {}
+        self.idle = []
+
+    def new_tab(self):
+        old_handles = set(self.wd.window_handles)
+        self.wd.execute_script("window.open()")
+        new_handles = [h for h in self.wd.window_handles if h not in old_handles]
+        handle = new_handles[-1] if new_handles else self.wd.window_handles[-1]
+        self.wd.switch_to.window(handle)
+        self.browser_profile.prepare_tab(self.wd)
+        self.uses[handle] = 0
+        return handle
+
+    def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+        return self.new_tab()
+
+    def load(self, handle, url, wait=True):
+        # wait=False starts the navigation and returns, so the page loads in
+        # the background while another tab is read. window.tabPoolLeaving is
+        # set on the page being left, the new page starts without it
+        self.wd.switch_to.window(handle)
+        self.uses[handle] = self.uses.get(handle, 0) + 1
+        if wait:
+            self.wd.get(url)
+        else:
+            self.wd.execute_script(
+                "window.tabPoolLeaving = true; window.location.href = arguments[0]",
+                url,
+            )
+
+    def release(self, handle, broken=False):
+        if not broken and self.uses.get(handle, 0) < self.max_uses:
+            self.idle.append(handle)
+            return
+        self.uses.pop(handle, None)
+        try:
+            self.wd.switch_to.window(handle)
+            self.wd.close()
+        except WebDriverException:
+            pass
+        handles = self.wd.window_handles
+        if handles:
+            self.wd.switch_to.window(handles[0])
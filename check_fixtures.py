@@ -0,0 +1,76 @@
+"""
+Offline check of the HTTP fast path of script0 against saved GitHub pages.
+
+Every page in fixtures/ is read with HttpPageFetcher.parse_document and
+HttpPageFetcher.extract_links, the same calls the crawl makes on a fetched
+page, and compared with the links and next page it is known to contain.
+Nothing goes to the network.
+
+    python check_fixtures.py
+
+Save a new page with the browser ("Save page as", HTML only) and add it to
+FIXTURES below when GitHub changes its markup.
+"""
+
+import pathlib
+import sys
+
+from script0 import GetGitHubLinks, HttpPageFetcher
+
+BASE_DIR = pathlib.Path(__file__).parent.resolve()
+
+FIXTURES_DIR = BASE_DIR / "fixtures"
+
+# File name -> url it was saved from, parser key and expected result. A page
+# without "links" is GitHub's rate limit page
+FIXTURES = {
+    "search_repositories.html": {
+        "url": "https://github.com/search?q=favorita+grocery&type=repositories",
+        "key": "search_repositories_result",
+        "links": [
+            "https://github.com/Kaggle/favorita-grocery-sales-forecasting",
+            "https://github.com/sjvasquez/web-traffic-forecasting",
+            "https://github.com/drivendataorg/favorita_grocery",
+        ],
+        "next_page": "https://github.com/search?p=2&q=favorita+grocery&type=repositories",
+    },
+    "rate_limit.html": {
+        "url": "https://github.com/search?q=favorita+grocery&type=repositories",
+    },
+}
+
+
+def check_fixture(file_name, expected, callbacks_list):
+    # Returns the differences from the expected result, empty when it matches
+    with open(FIXTURES_DIR / file_name, "r", encoding="utf-8") as file:
+        page_html = file.read()
+
+    document = HttpPageFetcher.parse_document(page_html, expected["url"])
+    if "links" not in expected:
+        if document is not None:
+            return ["rate limit page not detected"]
+        return []
+    if document is None:
+        return ["read as a rate limit page"]
+
+    links, next_page = HttpPageFetcher.extract_links(
+        document, callbacks_list[expected["key"]]
+    )
+    errors = []
+    if links != expected["links"]:
+        errors.append(f"links {links}, expected {expected['links']}")
+    if next_page != expected["next_page"]:
+        errors.append(f"next page {next_page}, expected {expected['next_page']}")
+    return errors
+
+
+if __name__ == "__main__":
+    callbacks_list = GetGitHubLinks.get_callbacks_list()
+    failed = 0
+    for file_name, expected in FIXTURES.items():
+        errors = check_fixture(file_name, expected, callbacks_list)
+        print(f"{'FAIL' if errors else 'ok':4} {file_name}")
+        for error in errors:
+            print(f"     {error}")
+        failed += bool(errors)
+    sys.exit(1 if failed else 0)
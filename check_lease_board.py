@@ -0,0 +1,115 @@
+"""
+Check of lease_board.py with several processes sharing one board.
+
+WORKERS processes add the same ITEMS items to a board in a scratch folder
+and work through the ones they claim. The first DYING_WORKERS of them exit
+while holding a lease after a few items, like a crashed or killed script.
+Every item has to be processed exactly once, the items of the dead
+processes by the others once their leases expired, and every process has to
+get its own numbers from LeaseBoard.next_number.
+
+    python check_lease_board.py [folder]
+
+The board is made in a new folder under folder (the system's temporary
+folder by default), give one on a network filesystem (e.g. NFS) to check
+the board there.
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from lease_board import LeaseBoard
+
+WORKERS = 6
+DYING_WORKERS = 2
+ITEMS = 200
+# Items processed before a dying worker exits
+ITEMS_BEFORE_DYING = 10
+# Short, so the leases of the dead workers are taken over quickly
+LEASE_SECONDS = 1
+
+
+def worker(path, index):
+    board = LeaseBoard(path, owner=f"worker-{index}", lease_seconds=LEASE_SECONDS)
+    for number in range(ITEMS):
+        board.add(f"item-{number}")
+
+    dies = index < DYING_WORKERS
+    processed = 0
+    with open(os.path.join(path, f"processed-{index}.txt"), "a") as file:
+        for item in board.claims(poll_interval=0.2):
+            if dies and processed == ITEMS_BEFORE_DYING:
+                # Exits holding the lease of item, without cleaning up
+                file.flush()
+                os._exit(1)
+            time.sleep(0.001)
+            file.write(f"{item} {board.next_number()}\n")
+            file.flush()
+            board.complete(item)
+            processed += 1
+    with open(os.path.join(path, f"taken_over-{index}.txt"), "w") as file:
+        file.write(str(board.taken_over))
+    board.close()
+
+
+def check_board(path):
+    # Returns the differences from the expected result, empty when it matches
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, index))
+        for index in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    items = collections.Counter()
+    numbers = collections.Counter()
+    taken_over = 0
+    for index in range(WORKERS):
+        with open(os.path.join(path, f"processed-{index}.txt"), "r") as file:
+            for line in file:
+                item, number = line.split()
+                items[item] += 1
+                numbers[number] += 1
+        if index >= DYING_WORKERS:
+            with open(os.path.join(path, f"taken_over-{index}.txt"), "r") as file:
+                taken_over += int(file.read())
+
+    errors = []
+    missing = ITEMS - len(items)
+    if missing:
+        errors.append(f"{missing} items not processed")
+    repeated = [item for item, count in items.items() if count > 1]
+    if repeated:
+        errors.append(f"{len(repeated)} items processed more than once")
+    if any(count > 1 for count in numbers.values()):
+        errors.append("numbers given out more than once")
+    if taken_over < DYING_WORKERS:
+        errors.append(
+            f"{taken_over} leases taken over, expected at least {DYING_WORKERS}"
+        )
+    exit_codes = [process.exitcode for process in processes]
+    if exit_codes[DYING_WORKERS:] != [0] * (WORKERS - DYING_WORKERS):
+        errors.append(f"workers exited with {exit_codes}")
+    summary = LeaseBoard(path, owner="check").get_summary()
+    if summary["done"] != ITEMS or summary["leased"]:
+        errors.append(f"board left with {summary}")
+    return errors
+
+
+if __name__ == "__main__":
+    path = tempfile.mkdtemp(prefix="lease_board_", dir=(sys.argv[1:] or [None])[0])
+    started_at = time.monotonic()
+    errors = check_board(path)
+    print(
+        f"{'FAIL' if errors else 'ok':4} {WORKERS} processes, {DYING_WORKERS} dying, "
+        f"{ITEMS} items in {time.monotonic() - started_at:.1f}s ({path})"
+    )
+    for error in errors:
+        print(f"     {error}")
+    sys.exit(1 if errors else 0)
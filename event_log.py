@@ -0,0 +1,108 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+
+class EventLog:
+    # One JSON line per event (a page crawled, a repository downloaded, a zip
+    # unzipped, ...) with its stage, status and fields such as repo, seconds
+    # and bytes, for tools rather than people. emit only puts the event in a
+    # bounded queue, a background thread writes the lines in batches, so the
+    # workers never wait for the disk; events arriving while the queue is full
+    # are dropped and counted. High volume events are sampled: sample_rates
+    # maps "<stage>.<status>" to the share of events kept (every n-th one).
+    max_queued = 10000
+    max_batch = 1000
+    sample_rates = {"crawl.collected": 0.1}
+
+    def __init__(self, path=None, sample_rates=None):
+        self.path = path
+        self.sample_rates = dict(EventLog.sample_rates)
+        self.sample_rates.update(sample_rates or {})
+        self.queue = queue.Queue(maxsize=EventLog.max_queued)
+        self.lock = threading.Lock()
+        # "<stage>.<status>" -> events seen, for sampling
+        self.seen = {}
+        self.dropped = 0
+        self.writer = None
+
+    def emit(self, stage, status, **fields):
+        if not self.path:
+            return
+        name = f"{stage}.{status}"
+        rate = self.sample_rates.get(name, 1)
+        if rate < 1:
+            with self.lock:
+                seen = self.seen.get(name, 0)
+                self.seen[name] = seen + 1
+            if rate <= 0 or seen % round(1 / rate):
+                return
+            fields["sample_rate"] = rate
+        event = {"time": round(time.time(), 3), "stage": stage, "status": status}
+        event.update(fields)
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def start(self):
+        if self.path:
+            self.writer = threading.Thread(target=self.write_events, daemon=True)
+            self.writer.start()
+        return self
+
+    def write_events(self):
+        with open(self.path, "a") as file:
+            while True:
+                events = [self.queue.get()]
+                while len(events) < EventLog.max_batch:
+                    try:
+                        events.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                file.write(
+                    "".join(
+                        json.dumps(event, default=str) + "\n"
+                        for event in events
+                        if event is not None
+                    )
+                )
+                file.flush()
+                if None in events:
+                    return
+
+    def stop(self):
+        # Writes the queued events and a last one with the dropped count. The
+        # scripts also call it at exit (with Metrics.stop), so a run that
+        # crashes still writes the last events and numbers, the ones that
+        # explain it
+        if self.writer is None:
+            return
+        if self.dropped:
+            self.queue.put(
+                {
+                    "time": round(time.time(), 3),
+                    "stage": "events",
+                    "status": "dropped",
+                    "count": self.dropped,
+                }
+            )
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+
+
+def start_log_listener(logger, *handlers):
+    # Log calls only queue the record, a background thread formats and writes
+    # it with the handlers, so workers never wait for the console or the log
+    # file. The thread writes what is left and stops at exit
+    log_queue = queue.Queue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
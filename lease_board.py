@@ -0,0 +1,239 @@
+import hashlib
+import os
+import pathlib
+import socket
+import threading
+import time
+
+
+class LeaseBoard:
+    # Work items shared by processes and hosts through one folder, e.g. on a
+    # network filesystem. Only atomic filesystem operations are used: an item
+    # is added with os.link (fails when it exists), claimed by creating its
+    # lease file with O_EXCL, kept by touching the lease (a heartbeat thread
+    # does it for every held lease) and finished with a done marker. A lease
+    # not touched for lease_seconds belongs to a dead worker, the next claim
+    # takes it over and the item runs again. The clocks of the hosts have to
+    # agree within a fraction of lease_seconds.
+    lease_seconds = 300
+    block_size = 1000
+    folders = ["items", "leases", "done", "blocks", "tmp"]
+
+    def __init__(self, path, owner=None, lease_seconds=None):
+        self.path = pathlib.Path(path)
+        # Unique per process, written into its leases
+        self.owner = owner or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds or LeaseBoard.lease_seconds
+        for folder in LeaseBoard.folders:
+            os.makedirs(self.path / folder, exist_ok=True)
+
+        self.lock = threading.Lock()
+        # key -> item of the leases this process holds
+        self.held = {}
+        # Keys left to try from the last scan of items/
+        self.candidates = []
+        self.numbers = iter(())
+        self.taken_over = 0
+        self.stopped = threading.Event()
+        self.heartbeat = None
+
+    @staticmethod
+    def get_key(name):
+        return hashlib.sha1(name.encode()).hexdigest()
+
+    def write_new(self, path, content):
+        # Creates path with its full content, or returns False when it exists
+        temp_path = self.path / "tmp" / f"{path.name}.{self.owner}.{threading.get_ident()}"
+        with open(temp_path, "w") as file:
+            file.write(content)
+        try:
+            os.link(temp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(temp_path)
+
+    def add(self, item, name=None):
+        # name identifies the item (the item itself by default), an item is
+        # only added once whoever adds it first. Returns whether it was new
+        return self.write_new(self.path / "items" / LeaseBoard.get_key(name or item), item)
+
+    def claim(self):
+        # Returns an item leased to this process, None when nothing can be
+        # claimed right now
+        with self.lock:
+            for rescan in (False, True):
+                if rescan:
+                    self.candidates = sorted(os.listdir(self.path / "items"), reverse=True)
+                while self.candidates:
+                    key = self.candidates.pop()
+                    if key in self.held or os.path.exists(self.path / "done" / key):
+                        continue
+                    if self.lease(key):
+                        # Done markers are written before leases are dropped,
+                        # the item may have been finished since the check
+                        if os.path.exists(self.path / "done" / key):
+                            os.unlink(self.path / "leases" / key)
+                            continue
+                        with open(self.path / "items" / key, "r") as file:
+                            item = file.read()
+                        self.held[key] = item
+                        self.start_heartbeat()
+                        return item
+        return None
+
+    def lease(self, key):
+        lease_path = self.path / "leases" / key
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return self.take_over(key)
+        with os.fdopen(fd, "w") as file:
+            file.write(self.owner)
+        return True
+
+    def take_over(self, key):
+        lease_path = self.path / "leases" / key
+        if not self.is_expired(lease_path):
+            return False
+        # Only one claimer can move the lease away
+        stale_path = self.path / "tmp" / f"{key}.{self.owner}.stale"
+        try:
+            os.rename(lease_path, stale_path)
+        except FileNotFoundError:
+            return False
+        if not self.is_expired(stale_path):
+            # Touched by its owner in the meantime, put it back
+            try:
+                os.link(stale_path, lease_path)
+            except FileExistsError:
+                pass
+            os.unlink(stale_path)
+            return False
+        os.unlink(stale_path)
+        self.taken_over += 1
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as file:
+            file.write(self.owner)
+        return True
+
+    def is_expired(self, lease_path):
+        try:
+            touched_at = os.stat(lease_path).st_mtime
+        except FileNotFoundError:
+            return False
+        return time.time() - touched_at > self.lease_seconds
+
+    def is_owner(self, key):
+        try:
+            with open(self.path / "leases" / key, "r") as file:
+                return file.read() == self.owner
+        except FileNotFoundError:
+            return False
+
+    def renew(self):
+        # Touches the held leases, drops the ones taken over by another worker
+        with self.lock:
+            for key in list(self.held):
+                if self.is_owner(key):
+                    try:
+                        os.utime(self.path / "leases" / key)
+                        continue
+                    except FileNotFoundError:
+                        pass
+                self.held.pop(key)
+
+    def start_heartbeat(self):
+        if self.heartbeat is None:
+            self.heartbeat = threading.Thread(target=self.beat, daemon=True)
+            self.heartbeat.start()
+
+    def beat(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            self.renew()
+
+    def complete(self, item, name=None):
+        key = LeaseBoard.get_key(name or item)
+        open(self.path / "done" / key, "w").close()
+        self.release(item, name)
+
+    def release(self, item, name=None):
+        # Gives the item back, e.g. when this worker cannot finish it
+        key = LeaseBoard.get_key(name or item)
+        with self.lock:
+            self.held.pop(key, None)
+            if self.is_owner(key):
+                os.unlink(self.path / "leases" / key)
+
+    def is_finished(self):
+        # Every item added so far is done
+        return len(os.listdir(self.path / "items")) == len(
+            os.listdir(self.path / "done")
+        )
+
+    def claims(self, poll_interval=5):
+        # Claimed items until every item is done. Waits while the remaining
+        # items are leased, they may be given back or their lease may expire
+        while True:
+            item = self.claim()
+            if item is not None:
+                yield item
+            elif self.is_finished():
+                return
+            else:
+                time.sleep(poll_interval)
+
+    def start_numbers(self, first_number):
+        # The first number of next_number, kept by the first process only, so
+        # every process numbers from the same point
+        self.write_new(self.path / "first_number", str(first_number))
+
+    def next_number(self):
+        # Unique across processes, not consecutive: numbers are handed out in
+        # blocks of block_size, one block per process at a time
+        with self.lock:
+            number = next(self.numbers, None)
+            if number is not None:
+                return number
+            first_path = self.path / "first_number"
+            first_number = 1
+            if os.path.exists(first_path):
+                with open(first_path, "r") as file:
+                    first_number = int(file.read())
+            block = len(os.listdir(self.path / "blocks"))
+            while True:
+                try:
+                    os.close(
+                        os.open(
+                            self.path / "blocks" / f"{block:08d}",
+                            os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+                        )
+                    )
+                    break
+                except FileExistsError:
+                    block += 1
+            start = first_number + block * LeaseBoard.block_size
+            self.numbers = iter(range(start + 1, start + LeaseBoard.block_size))
+            return start
+
+    def get_summary(self):
+        return {
+            "items": len(os.listdir(self.path / "items")),
+            "done": len(os.listdir(self.path / "done")),
+            "leased": len(os.listdir(self.path / "leases")),
+            "taken_over": self.taken_over,
+        }
+
+    def close(self):
+        # Leases still held are given back, so other workers need not wait
+        # for them to expire
+        self.stopped.set()
+        with self.lock:
+            for key in list(self.held):
+                if self.is_owner(key):
+                    os.unlink(self.path / "leases" / key)
+            self.held = {}
@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Metrics:
+    # Counters and timers of a run, shared by the threads of a script. Timers
+    # keep a latency histogram. The snapshot is written to a JSON file every
+    # snapshot_interval seconds and can also be served in the Prometheus text
+    # format on a local port.
+    prefix = "github_scraper"
+    buckets = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+    snapshot_interval = 30
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counters = {}
+        self.timers = {}
+        self.stopped = threading.Event()
+        self.writer = None
+        self.server = None
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "max": 0.0,
+                    "buckets": [0] * len(Metrics.buckets),
+                }
+                self.timers[name] = timer
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(Metrics.buckets):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+                    break
+
+    @contextmanager
+    def timer(self, name):
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started_at)
+
+    def snapshot(self):
+        with self.lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            counters = {
+                name: {
+                    "total": round(value, 3),
+                    "per_second": round(value / uptime, 3),
+                    "per_minute": round(value / uptime * 60, 3),
+                }
+                for name, value in sorted(self.counters.items())
+            }
+            timers = {}
+            for name, timer in sorted(self.timers.items()):
+                histogram = {}
+                total = 0
+                for bound, count in zip(Metrics.buckets, timer["buckets"]):
+                    total += count
+                    histogram[str(bound)] = total
+                histogram["+Inf"] = timer["count"]
+                timers[name] = {
+                    "count": timer["count"],
+                    "total_seconds": round(timer["sum"], 3),
+                    "mean_seconds": round(timer["sum"] / timer["count"], 3),
+                    "max_seconds": round(timer["max"], 3),
+                    "histogram": histogram,
+                }
+        return {
+            "time": time.time(),
+            "uptime_seconds": round(uptime, 3),
+            "counters": counters,
+            "timers": timers,
+        }
+
+    def write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temp_path, self.snapshot_path)
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        for name, counter in snapshot["counters"].items():
+            metric = f"{Metrics.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counter['total']}")
+        for name, timer in snapshot["timers"].items():
+            metric = f"{Metrics.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in timer["histogram"].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum {timer['total_seconds']}")
+            lines.append(f"{metric}_count {timer['count']}")
+        metric = f"{Metrics.prefix}_uptime_seconds"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {snapshot['uptime_seconds']}")
+        return "\n".join(lines) + "\n"
+
+    def start(self, port=None):
+        # Writes snapshots in the background, and serves /metrics (Prometheus)
+        # and /metrics.json on localhost:port when a port is given
+        if self.snapshot_path:
+            self.writer = threading.Thread(target=self.write_snapshots, daemon=True)
+            self.writer.start()
+        if port:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path == "/metrics":
+                        body = metrics.to_prometheus().encode()
+                        content_type = "text/plain; version=0.0.4"
+                    elif self.path == "/metrics.json":
+                        body = json.dumps(metrics.snapshot()).encode()
+                        content_type = "application/json"
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def write_snapshots(self):
+        while not self.stopped.wait(Metrics.snapshot_interval):
+            self.write_snapshot()
+
+    def stop(self):
+        self.stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.write_snapshot()
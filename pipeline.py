@@ -0,0 +1,351 @@
+"""
+Runs script0, script1 and script2 at the same time: collected links flow into
+the downloader and downloaded archives into the extractor through bounded
+queues, so a repository is unzipped while the crawl is still going.
+
+Each stage keeps its usual outputs, so a crashed run resumes like the
+scripts do: the crawl from its checkpoint, downloads from collected minus
+downloaded links, extraction from the zips not yet unzipped.
+"""
+
+import atexit
+import logging
+import os
+import pathlib
+import queue
+import threading
+from logging.handlers import RotatingFileHandler
+
+import script0
+import script1
+import script2
+from browser import BrowserProfile
+from event_log import EventLog, start_log_listener
+from metrics import Metrics
+from rate_limiter import AdaptiveRateLimiter
+from state_store import StateStore
+
+BASE_DIR = pathlib.Path(__file__).parent.resolve()
+
+log_file = BASE_DIR / "outputs/pipeline.log"
+
+root_logger = logging.getLogger(__name__)
+root_logger.setLevel(logging.DEBUG)
+
+formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+rotating_file_log = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=1)
+rotating_file_log.setFormatter(formatter)
+
+console_log = logging.StreamHandler()
+console_log.setLevel(logging.INFO)
+console_log.setFormatter(formatter)
+
+start_log_listener(root_logger, rotating_file_log, console_log)
+
+
+class Pipeline:
+    end_of_stage = None
+
+    def __init__(
+        self,
+        initial_links,
+        total_links_to_download=None,
+        banned_waiting_time=30,
+        crawler_workers=1,
+        download_workers=4,
+        unzip_workers=1,
+        queue_size=100,
+        use_http_fetcher=True,
+        use_http_downloader=True,
+        member_filter=None,
+        content_store=None,
+        state_store=None,
+        browser_profile=None,
+        metrics=None,
+        refresh=False,
+        partition_searches=False,
+        events=None,
+    ):
+        self.initial_links = initial_links
+        self.total_links_to_download = total_links_to_download
+        self.banned_waiting_time = banned_waiting_time
+        self.crawler_workers = crawler_workers
+        self.download_workers = download_workers
+        self.unzip_workers = unzip_workers
+        self.use_http_fetcher = use_http_fetcher
+        self.use_http_downloader = use_http_downloader
+        self.member_filter = member_filter
+        self.content_store = content_store
+        self.state_store = state_store
+        # Headless and lean by default, nobody watches the pipeline's browsers
+        self.browser_profile = browser_profile or BrowserProfile.lean()
+        # One set of counters for the three stages
+        self.metrics = metrics or Metrics()
+        # One event log for the three stages too
+        self.events = events or EventLog()
+        # Download and unzip again the collected repositories that changed
+        self.refresh = refresh
+        # Split searches past GitHub's result cap into sub-queries
+        self.partition_searches = partition_searches
+        # Crawl and downloads count against the same GitHub limits
+        self.rate_limiter = AdaptiveRateLimiter(
+            rate=script0.GetGitHubLinks.requests_per_second, backoff=banned_waiting_time
+        )
+
+        self.download_path = BASE_DIR / "RepoDownloads"
+        self.outputs_path = BASE_DIR / "outputs"
+
+        # Bounded, so a fast stage waits for a slow one instead of piling up
+        self.links_queue = queue.Queue(maxsize=queue_size)
+        self.archives_queue = queue.Queue(maxsize=queue_size)
+        self.errors = []
+        # Queues whose consuming stage died
+        self.abandoned_queues = set()
+
+    @staticmethod
+    def iter_queue(items):
+        while True:
+            item = items.get()
+            if item is Pipeline.end_of_stage:
+                return
+            yield item
+
+    def hand_over(self, items, item):
+        # Stops waiting when the consuming stage died, the item is already in
+        # the output files and is picked up again on the next run
+        while id(items) not in self.abandoned_queues:
+            try:
+                items.put(item, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def collect_links(self, links):
+        for number, link in links:
+            self.hand_over(self.links_queue, f"{number} {link}")
+
+    def collect_archive(self, file_name):
+        self.hand_over(self.archives_queue, file_name)
+
+    def get_crawler(self):
+        # Links are handed on when the checkpoint flushes, keep that frequent
+        if (
+            self.crawler_workers > 1
+            or len(self.initial_links) > 1
+            or self.partition_searches
+        ):
+            crawler = script0.ParallelGetGitHubLinks(
+                download_path=str(self.download_path),
+                total_links_to_download=self.total_links_to_download,
+                initial_links=self.initial_links,
+                banned_waiting_time=self.banned_waiting_time,
+                workers=self.crawler_workers,
+                checkpoint_flush_interval=1,
+                use_http_fetcher=self.use_http_fetcher,
+                state_store=self.state_store,
+                rate_limiter=self.rate_limiter,
+                browser_profile=self.browser_profile,
+                metrics=self.metrics,
+                events=self.events,
+                search_partitioner=(
+                    script0.SearchPartitioner(
+                        script0.HttpPageFetcher(rate_limiter=self.rate_limiter)
+                    )
+                    if self.partition_searches
+                    else None
+                ),
+            )
+        else:
+            crawler = script0.GetGitHubLinks(
+                download_path=str(self.download_path),
+                total_links_to_download=self.total_links_to_download,
+                initial_link=self.initial_links[0],
+                banned_waiting_time=self.banned_waiting_time,
+                checkpoint_flush_interval=1,
+                http_fetcher=(
+                    script0.HttpPageFetcher(rate_limiter=self.rate_limiter)
+                    if self.use_http_fetcher
+                    else None
+                ),
+                state_store=self.state_store,
+                rate_limiter=self.rate_limiter,
+                browser_profile=self.browser_profile,
+                metrics=self.metrics,
+                events=self.events,
+            )
+        crawler.checkpoint.on_flush = self.collect_links
+        return crawler
+
+    def run_stage(self, name, target, input_queue, next_queue):
+        try:
+            target()
+        except Exception as e:
+            root_logger.error(f"{name} stage failed. Error: {e}")
+            self.errors.append((name, e))
+            if input_queue is not None:
+                self.abandoned_queues.add(id(input_queue))
+        finally:
+            if next_queue is not None:
+                self.hand_over(next_queue, Pipeline.end_of_stage)
+            root_logger.info(f"{name} stage finished.")
+
+    def run(self):
+        downloaded_link_path = self.outputs_path / "downloaded_link.txt"
+
+        # Work left over from an earlier run goes first
+        script1.CleanUp(downloaded_link_path)
+        if self.refresh:
+            # Every collected repository is checked for changes
+            pending_links = script1.Utils.read_urls(
+                self.outputs_path / "collected_links.txt"
+            )
+        elif self.state_store:
+            pending_links = self.state_store.get_pending_downloads()
+        else:
+            pending_links = script1.Utils.get_starting_links(
+                collected_links_path=self.outputs_path / "collected_links.txt",
+                downloaded_link_path=downloaded_link_path,
+            )
+        unzip = script2.UnZip(
+            zips_input_path=self.download_path,
+            state_store=self.state_store,
+            member_filter=self.member_filter,
+            metrics=self.metrics,
+            content_store=self.content_store,
+            events=self.events,
+        )
+        pending_archives = sorted(unzip.files)
+        root_logger.info(
+            f"Resuming with {len(pending_links)} links to download "
+            f"and {len(pending_archives)} zips to unzip."
+        )
+
+        crawler = self.get_crawler()
+        downloader = script1.DownloadGitZips(
+            downloaded_link_path=downloaded_link_path,
+            download_path=self.download_path,
+            http_downloader=(
+                script1.HttpZipDownloader(
+                    download_path=self.download_path,
+                    pool_size=self.download_workers,
+                    rate_limiter=self.rate_limiter,
+                    archive_versions=script1.ArchiveVersions(),
+                )
+                if self.use_http_downloader
+                else None
+            ),
+            workers=self.download_workers,
+            state_store=self.state_store,
+            rate_limiter=self.rate_limiter,
+            browser_profile=self.browser_profile,
+            metrics=self.metrics,
+            refresh=self.refresh,
+            events=self.events,
+        )
+        downloader.on_downloaded = self.collect_archive
+
+        def links():
+            yield from pending_links
+            yield from Pipeline.iter_queue(self.links_queue)
+
+        def archives():
+            yield from pending_archives
+            yield from Pipeline.iter_queue(self.archives_queue)
+
+        stages = [
+            ("Crawl", crawler.run, None, self.links_queue),
+            (
+                "Download",
+                lambda: downloader.run(links()),
+                self.links_queue,
+                self.archives_queue,
+            ),
+            (
+                "Unzip",
+                lambda: unzip.run(self.unzip_workers, archives()),
+                self.archives_queue,
+                None,
+            ),
+        ]
+        threads = [
+            threading.Thread(target=self.run_stage, args=stage, name=stage[0])
+            for stage in stages
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self.errors:
+            root_logger.error(f"Pipeline finished with errors in: {self.errors}")
+        else:
+            root_logger.info("##################### Pipeline Done #####################")
+
+
+if __name__ == "__main__":
+    # Links to crawl (users, organizations, searches)
+    LINKS = ["https://github.com/search?q=favorita+grocery&type=issues"]
+
+    # One seed url per line, crawled instead of LINKS when the file exists
+    SEEDS_FILE = BASE_DIR / "seeds.txt"
+    if os.path.exists(SEEDS_FILE):
+        LINKS = script0.Utility.read_seeds(SEEDS_FILE)
+
+    # Set None to download all links
+    links_to_download = None
+
+    ban_waiting_time = 30
+
+    # Concurrency of every stage
+    crawler_workers = 1
+    download_workers = 4
+    unzip_workers = os.cpu_count() or 1
+
+    # Items waiting between two stages
+    queue_size = 100
+
+    # Split searches past GitHub's 1000 results into sub-queries (see script0.py)
+    partition_searches = False
+
+    # Store identical extracted files once, as hardlinks (see script2.py)
+    deduplicate = False
+    content_store = None
+    if deduplicate:
+        content_store = script2.ContentStore(BASE_DIR / "RepoDownloads/.objects")
+
+    use_state_store = False
+    state_store = None
+    if use_state_store:
+        state_store = StateStore()
+        state_store.import_text_files()
+
+    # Timings and counters of all stages, written to outputs/metrics_pipeline.json.
+    # Set a port to also serve them at http://127.0.0.1:<port>/metrics (Prometheus)
+    metrics_port = None
+    metrics = Metrics(snapshot_path=BASE_DIR / "outputs/metrics_pipeline.json")
+    metrics.start(port=metrics_port)
+
+    # Pages, repositories and archives, one JSON line each, written to
+    # outputs/events_pipeline.jsonl
+    events = EventLog(BASE_DIR / "outputs/events_pipeline.jsonl").start()
+    atexit.register(metrics.stop)
+    atexit.register(events.stop)
+
+    Pipeline(
+        initial_links=LINKS,
+        total_links_to_download=links_to_download,
+        banned_waiting_time=ban_waiting_time,
+        crawler_workers=crawler_workers,
+        download_workers=download_workers,
+        unzip_workers=unzip_workers,
+        queue_size=queue_size,
+        partition_searches=partition_searches,
+        content_store=content_store,
+        state_store=state_store,
+        metrics=metrics,
+        events=events,
+    ).run()
+
+    events.stop()
+    metrics.stop()
@@ -0,0 +1,130 @@
+import email.utils
+import random
+import threading
+import time
+
+
+class AdaptiveRateLimiter:
+    # Token bucket shared by every fetcher of a run (page loads, HTTP requests,
+    # downloads). The rate goes up a little after each successful request and
+    # is halved when GitHub pushes back, which also blocks everybody for an
+    # exponential backoff with jitter, or for as long as Retry-After /
+    # X-RateLimit-Reset say when GitHub sends them.
+
+    def __init__(
+        self,
+        rate=1.0,
+        min_rate=1 / 60,
+        max_rate=5.0,
+        rate_increase=0.05,
+        burst=2,
+        backoff=30,
+        max_backoff=900,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_increase = rate_increase
+        self.burst = burst
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+        self.consecutive_throttles = 0
+        self.total_throttles = 0
+        self.total_requests = 0
+
+    def refill(self, now):
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def acquire(self):
+        # Blocks until a request is allowed, returns the time spent waiting
+        waited = 0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    self.total_requests += 1
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def success(self):
+        with self.lock:
+            self.consecutive_throttles = 0
+            self.rate = min(self.max_rate, self.rate + self.rate_increase)
+
+    def throttled(self, retry_after=None):
+        # Returns how long requests are blocked
+        with self.lock:
+            self.consecutive_throttles += 1
+            self.total_throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+
+            if retry_after is None:
+                delay = min(
+                    self.max_backoff,
+                    self.backoff * 2 ** (self.consecutive_throttles - 1),
+                )
+                delay = delay / 2 + random.uniform(0, delay / 2)
+            else:
+                delay = retry_after
+
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self.tokens = 0
+            return self.blocked_until - now
+
+    @staticmethod
+    def parse_retry_after(value):
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def update_from_headers(self, status_code, headers):
+        # Returns True when the response says we are rate limited
+        retry_after = AdaptiveRateLimiter.parse_retry_after(headers.get("Retry-After"))
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+
+        if remaining == "0" and reset and reset.isdigit():
+            retry_after = max(retry_after or 0, int(reset) - time.time())
+
+        if status_code == 429 or (status_code == 403 and retry_after is not None):
+            self.throttled(retry_after)
+            return True
+
+        if remaining == "0" and retry_after:
+            # Last request of the window went through, wait for the reset
+            with self.lock:
+                self.blocked_until = max(
+                    self.blocked_until, time.monotonic() + retry_after
+                )
+        return False
+
+    def report(self):
+        with self.lock:
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "blocked_for": round(max(0, self.blocked_until - time.monotonic()), 1),
+                "requests": self.total_requests,
+                "throttled": self.total_throttles,
+            }
@@ -7,27 +7,51 @@ There are three parameters to set:
 2. Initial Link
 LINK = 'https://github.com/Parth971'
 
-3. Ban Waiting Time: time to wait until we request for next link
+3. Ban Waiting Time: first wait after a ban, doubled (with jitter) on every ban in a row.
+Requests between bans are paced by an adaptive rate limiter.
 ban_waiting_time = 30
+
+4. Checkpoint Flush Interval: collected links buffered before they are written
+checkpoint_flush_interval = 50
+
+5. Crawler Workers: number of Chrome instances crawling pages in parallel
+crawler_workers = 1
+EXTRA_LINKS = []
+SEEDS_FILE = BASE_DIR / "seeds.txt"  (one seed url per line, replaces LINK and EXTRA_LINKS)
+
+6. HTTP Fast Path: read listing pages without Chrome when the HTML allows it
+use_http_fetcher = True
+
+7. State Store: also keep collected links in the SQLite ledger shared by all scripts
+use_state_store = False
 """
 
 from functools import partial
+import atexit
+import datetime
 import json
 import logging
 import os
 import pathlib
+import queue
 import re
+import threading
 from logging.handlers import RotatingFileHandler
 import subprocess
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
 
-from selenium import webdriver
-from selenium.common import NoSuchElementException
-from selenium.webdriver.common.by import By
+import requests
+from lxml import etree, html as lxml_html
+from requests.adapters import HTTPAdapter
 import time
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+
+from browser import BrowserProfile, TabPool
+from event_log import EventLog, start_log_listener
+from lease_board import LeaseBoard
+from metrics import Metrics
+from rate_limiter import AdaptiveRateLimiter
+from state_store import StateStore
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
 
@@ -48,73 +72,394 @@ console_log = logging.StreamHandler()
 console_log.setLevel(logging.INFO)
 console_log.setFormatter(formatter)
 
-root_logger.addHandler(rotating_file_log)
-root_logger.addHandler(console_log)
+start_log_listener(root_logger, rotating_file_log, console_log)
 
 
 class UrlParser:
+    # Routes urls to the name of their parser with one regex, compiled once
+    # per domain. Top level GitHub pages (topics, explore, ...) are neither
+    # users nor repositories.
+    search_types = {
+        "issues": "search_issue_result",
+        "discussions": "search_discussion_result",
+        "wikis": "search_wikis_result",
+        "commits": "search_commit_result",
+    }
+    reserved_names = [
+        "about", "apps", "codespaces", "collections", "customer-stories",
+        "enterprise", "events", "explore", "features", "issues", "login",
+        "marketplace", "new", "notifications", "orgs", "pricing", "pulls",
+        "search", "security", "settings", "site", "sponsors", "team", "topics",
+        "trending", "users",
+    ]
+    routes = {"organization": "main", "user": "main", "repo": "repo"}
+
     def __init__(self, domain):
         self.domain = domain
+        domain_pattern = re.escape(domain)
+        reserved = "|".join(UrlParser.reserved_names)
+        not_reserved = f"(?!(?i:{reserved})(?:[/?#]|$))"
+        self.router = re.compile(
+            f"^{domain_pattern}(?:"
+            # https://github.com/orgs/drivendataorg/repositories
+            # https://github.com/orgs/drivendataorg/repositories?page=3
+            r"(?P<organization>orgs/[^/]+/repositories/?(\?page=\d+)?)"
+            # https://github.com/drivendataorg
+            f"|(?P<user>{not_reserved}[^/]+/?)"
+            # https://github.com/abhisheknaiidu/awesome-github-profile-readme
+            f"|(?P<repo>{not_reserved}[A-Za-z0-9-]+/[A-Za-z0-9._-]+)"
+            ")$"
+        )
+        self.search_prefix = domain + "search?"
+        self.search_type = re.compile(r"[?&]type=([A-Za-z]+)")
+
+    def normalize(self, url):
+        # Same spelling for the same page: scheme and host of the domain, no
+        # fragment and no trailing slash
+        url = url.strip()
+        domain = urlsplit(self.domain)
+        if "://" not in url:
+            url = f"{domain.scheme}://{url}"
+        parts = urlsplit(url)
+        netloc = parts.netloc.lower()
+        scheme = parts.scheme.lower()
+        if netloc in (domain.netloc, f"www.{domain.netloc}"):
+            scheme, netloc = domain.scheme, domain.netloc
+        return urlunsplit((scheme, netloc, parts.path.rstrip("/"), parts.query, ""))
+
+    def classify(self, url):
+        if url.startswith(self.search_prefix):
+            search_type = self.search_type.search(url)
+            if search_type:
+                name = UrlParser.search_types.get(search_type.group(1).lower())
+                if name:
+                    return name
+            return "search_repositories_result"
+
+        route = self.router.match(url)
+        if route:
+            return UrlParser.routes[route.lastgroup]
 
     def get_parser_name_from_url(self, url):
-        domain = self.domain
         url = url if url[-1] != "/" else url[:-1]
-        search_prefix = domain + "search?"
-
-        if url[: len(search_prefix)] == search_prefix:
-            if "type=issues" in url or "type=Issues" in url:
-                return "search_issue_result", url
-            elif "type=discussions" in url or "type=Discussions" in url:
-                return "search_discussion_result", url
-            elif "type=wikis" in url or "type=Wikis" in url:
-                return "search_wikis_result", url
-            elif "type=commits" in url or "type=Commits" in url:
-                return "search_commit_result", url
-            return "search_repositories_result", url
-
-        if url[: len(domain)] == domain:
-            organization_patterns = [
-                # https://github.com/orgs/drivendataorg/repositories
-                # https://github.com/orgs/drivendataorg/repositories/
-                # https://github.com/orgs/drivendataorg/repositories?page=3
-                (
-                    "main",
-                    "^https:\/\/github\.com\/orgs\/[^\/]+\/repositories\/?(\?page=\d+)?$",
-                ),
-                # https://github.com/drivendataorg
-                # https://github.com/drivendataorg/
-                ("main", "^https:\/\/github\.com\/[^\/]+\/?$"),
-                # https://github.com/abhisheknaiidu/awesome-github-profile-readme
-                # problem : /topics/portfolio also matches
-                ("repo", "^https:\/\/github\.com\/[A-Za-z0-9-]+\/[A-Za-z0-9-]+$"),
-            ]
-            for name, pattern in organization_patterns:
-                if re.match(pattern, url):
-                    return name, url
+        name = self.classify(url)
+        if name:
+            return name, url
 
         message = f"Url: {url} is not Valid! Maybe you have scraped all repositories OR your input url is incorrect."
         root_logger.warning(message)
         return None, None
 
+    def classify_all(self, urls):
+        # Normalizes, drops duplicates (GitHub names are case insensitive) and
+        # classifies seed urls in one pass. Returns [(name, url), ...] in the
+        # given order, invalid urls are logged and left out
+        seen = set()
+        seeds = []
+        invalid = 0
+        for url in urls:
+            url = self.normalize(url)
+            if url.lower() in seen:
+                continue
+            seen.add(url.lower())
+            name = self.classify(url)
+            if name is None:
+                root_logger.warning(f"Url: {url} is not Valid! Skipping this seed.")
+                invalid += 1
+                continue
+            seeds.append((name, url))
+        duplicates = len(urls) - len(seen)
+        root_logger.info(
+            f"Seeds ::: {len(seeds)} to crawl, {duplicates} duplicates, {invalid} invalid"
+        )
+        return seeds
+
 
 class SeleniumWebDriver:
-    def __init__(self, download_path):
+    def __init__(self, download_path, browser_profile=None):
         self.web_driver = None
         self.download_path = download_path
+        self.browser_profile = browser_profile or BrowserProfile()
 
     def get_webdriver(self):
-        options = webdriver.ChromeOptions()
-        options.add_argument("--start-maximized")
-        options.add_experimental_option(
-            "prefs", {"download.default_directory": self.download_path}
-        )
-
-        self.web_driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), options=options
-        )
+        self.web_driver = self.browser_profile.get_webdriver(self.download_path)
         return self.web_driver
 
 
+class HttpPageFetcher:
+    # Fetches listing pages with plain HTTP over pooled keep-alive connections
+    # and reads them with the same XPaths as the browser. Returns None whenever
+    # the browser is needed instead (rate limit, error, nothing matched).
+    user_agent = (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    )
+    request_timeout = 10
+    max_rate_limited = 3
+
+    def __init__(self, pool_size=10, rate_limiter=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = HttpPageFetcher.user_agent
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+
+    def get_document(self, url):
+        # A rate limited page is requested again once the limiter allows it,
+        # the browser would run into the same limit
+        for _ in range(HttpPageFetcher.max_rate_limited):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(
+                    url, timeout=HttpPageFetcher.request_timeout
+                )
+            except requests.RequestException as e:
+                root_logger.debug(f"HTTP fetch failed for {url}. Error: {e}")
+                return None
+
+            if self.rate_limiter.update_from_headers(
+                response.status_code, response.headers
+            ):
+                root_logger.info(f"HTTP fetch rate limited for {url}")
+                continue
+
+            if response.status_code != 200:
+                root_logger.debug(f"HTTP fetch got {response.status_code} for {url}")
+                return None
+
+            try:
+                document = HttpPageFetcher.parse_document(response.text, response.url)
+            except etree.ParserError as e:
+                # e.g. an empty body, the browser gets a chance instead
+                root_logger.debug(f"HTTP fetch got no HTML for {url}. Error: {e}")
+                return None
+            if document is None:
+                banned_time = self.rate_limiter.throttled()
+                root_logger.info(
+                    f"HTTP fetch rate limited for {url}, waiting {int(banned_time)}SEC"
+                )
+                continue
+
+            self.rate_limiter.success()
+            return document
+        return None
+
+    @staticmethod
+    def parse_document(page_html, url):
+        # None for GitHub's rate limit page
+        document = lxml_html.fromstring(page_html)
+        document.make_links_absolute(url)
+        if document.xpath(GetGitHubLinks.rate_limit_xpath):
+            return None
+        return document
+
+    @staticmethod
+    def extract_links(document, meta_data):
+        href_wrapper = meta_data["href_wrapper"]
+        res = [
+            href_wrapper(elem.get("href"))
+            for elem in document.xpath(meta_data["element_xpath"])
+        ]
+
+        next_page = None
+        elements = document.xpath(GetGitHubLinks.next_page_xpath)
+        if elements and elements[0].get("href"):
+            next_page = elements[0].get("href")
+
+        return res, next_page
+
+    def scrape_page(self, url, meta_data, first_page):
+        document = self.get_document(url)
+        if document is None:
+            return None
+
+        if first_page and meta_data.get("repository_page_xpath"):
+            # Follow the repositories tab instead of clicking it
+            tabs = document.xpath(meta_data["repository_page_xpath"])
+            if not tabs or not tabs[0].get("href"):
+                return None
+            document = self.get_document(tabs[0].get("href"))
+            if document is None:
+                return None
+
+        res, next_page = HttpPageFetcher.extract_links(document, meta_data)
+        if not res:
+            return None
+
+        root_logger.debug(f"Found links on page over HTTP ::: {len(res)} ")
+        return res, next_page
+
+
+class SearchPartitioner:
+    # GitHub lists at most result_cap results of a search. A search with more
+    # is split into disjoint sub-queries by qualifier ranges (created date,
+    # star count, ...), every range that still has too many results is halved
+    # again, and a range that cannot be halved (one day, one star count) is
+    # split by the next qualifier. The sub-queries list everything and are
+    # crawled as separate seeds. Result counts are read from the first page of
+    # each query over HTTP, and partitions are saved so a rerun does not count
+    # again. A partition with a count that could not be read is only used for
+    # this run and counted again on the next one.
+    result_cap = 1000
+    first_date = datetime.date(2007, 10, 1)
+    # Qualifiers to split by per search type, tried in this order
+    qualifiers = {
+        "repositories": ["created", "stars"],
+        "issues": ["created"],
+        "discussions": ["created"],
+        "commits": ["author-date"],
+    }
+    numeric_qualifiers = ["stars"]
+    result_count_patterns = [
+        re.compile(r'"result_count":\s*(\d+)'),
+        re.compile(r"([\d,]+)\s+(?:[a-z]+\s+)?results?\b", re.IGNORECASE),
+    ]
+    partitions_path = BASE_DIR / "outputs/search_partitions.json"
+
+    def __init__(self, http_fetcher, result_cap=None, qualifiers=None):
+        self.http_fetcher = http_fetcher
+        self.result_cap = result_cap or SearchPartitioner.result_cap
+        # e.g. ["pushed", "stars"] to split every search type by these instead
+        self.custom_qualifiers = qualifiers
+        self.url_parser = UrlParser(domain=GetGitHubLinks.github_domain)
+        self.partitions = {}
+        # Queries of the partition being built whose count could not be read
+        self.missing_counts = []
+        if os.path.exists(SearchPartitioner.partitions_path):
+            with open(SearchPartitioner.partitions_path, "r") as file:
+                self.partitions = json.load(file)
+
+    def expand(self, urls):
+        # Search urls are replaced by their sub-queries, other urls are kept
+        expanded = []
+        for url in urls:
+            url = self.url_parser.normalize(url)
+            if url.startswith(self.url_parser.search_prefix):
+                expanded += self.partition(url)
+            else:
+                expanded.append(url)
+        return expanded
+
+    def partition(self, url):
+        if url not in self.partitions:
+            self.missing_counts = []
+            query = parse_qs(urlsplit(url).query)
+            search_type = query.get("type", ["repositories"])[0].lower()
+            qualifiers = [
+                qualifier
+                for qualifier in (
+                    self.custom_qualifiers
+                    or SearchPartitioner.qualifiers.get(search_type, [])
+                )
+                # Ranges the query already sets are left alone
+                if f"{qualifier}:" not in query.get("q", [""])[0]
+            ]
+            sub_urls = self.split(url, qualifiers, self.get_result_count(url))
+            if self.missing_counts:
+                # Not saved, some of these may have more results than listed
+                root_logger.warning(
+                    f"Search {url} split into {len(sub_urls)} sub-queries, "
+                    f"incomplete: {len(self.missing_counts)} counts missing, "
+                    "counting again next run"
+                )
+                return sub_urls
+            self.partitions[url] = sub_urls
+            root_logger.info(f"Search {url} split into {len(sub_urls)} sub-queries")
+            self.save()
+        return self.partitions[url]
+
+    def split(self, url, qualifiers, count):
+        if count is None:
+            root_logger.warning(f"No result count for {url}, crawling it as it is")
+            self.missing_counts.append(url)
+            return [url]
+        if count == 0:
+            return []
+        if count <= self.result_cap:
+            return [url]
+        if not qualifiers:
+            root_logger.warning(
+                f"{url} has {count} results, only {self.result_cap} of them are listed"
+            )
+            return [url]
+        qualifier = qualifiers[0]
+        return [
+            sub_url
+            for half in self.halve(qualifier, self.get_full_range(qualifier))
+            for sub_url in self.split_range(url, qualifier, half, qualifiers[1:])
+        ]
+
+    def split_range(self, url, qualifier, value_range, qualifiers):
+        sub_url = SearchPartitioner.with_qualifier(url, qualifier, value_range)
+        count = self.get_result_count(sub_url)
+        halves = self.halve(qualifier, value_range)
+        if halves is None or count is None or count <= self.result_cap:
+            return self.split(sub_url, qualifiers, count)
+        return [
+            sub_url
+            for half in halves
+            for sub_url in self.split_range(url, qualifier, half, qualifiers)
+        ]
+
+    @staticmethod
+    def get_full_range(qualifier):
+        # Open ended, so a saved partition also lists what is added after it
+        if qualifier in SearchPartitioner.numeric_qualifiers:
+            return 0, None
+        return SearchPartitioner.first_date, None
+
+    @staticmethod
+    def halve(qualifier, value_range):
+        # None when the range is a single value
+        low, high = value_range
+        if qualifier in SearchPartitioner.numeric_qualifiers:
+            if high is None:
+                # Open ended, most results are at the low end
+                middle = max(2 * low, 100)
+                return [(low, middle), (middle + 1, None)]
+            if low >= high:
+                return None
+            middle = (low + high) // 2
+            return [(low, middle), (middle + 1, high)]
+        if high is None:
+            # Open ended, halved up to today and the upper half stays open
+            halves = SearchPartitioner.halve(
+                qualifier, (low, datetime.date.today())
+            )
+            return halves and [halves[0], (halves[1][0], None)]
+        if low >= high:
+            return None
+        middle = low + (high - low) // 2
+        return [(low, middle), (middle + datetime.timedelta(days=1), high)]
+
+    @staticmethod
+    def with_qualifier(url, qualifier, value_range):
+        low, high = value_range
+        high = "*" if high is None else high
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        query["q"] = [f"{query.get('q', [''])[0]} {qualifier}:{low}..{high}".strip()]
+        return urlunsplit(parts._replace(query=urlencode(query, doseq=True, safe=":*")))
+
+    def get_result_count(self, url):
+        document = self.http_fetcher.get_document(url)
+        if document is None:
+            return None
+        text = document.text_content()
+        for pattern in SearchPartitioner.result_count_patterns:
+            match = pattern.search(text)
+            if match:
+                return int(match.group(1).replace(",", ""))
+        return None
+
+    def save(self):
+        temp_path = f"{SearchPartitioner.partitions_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.partitions, file, indent=2)
+        os.replace(temp_path, SearchPartitioner.partitions_path)
+
+
 class Utility:
     @staticmethod
     def get_start_url(output_meta_path):
@@ -124,67 +469,257 @@ class Utility:
             return data
 
     @staticmethod
-    def save_meta(
-        current_page_link, downloaded_repo_link, last_file_number, meta_file_path
-    ):
-        data = {
-            "current_page_link": current_page_link,
-            "downloaded_repo_links": [downloaded_repo_link],
-            "last_file_number": last_file_number,
-        }
-        if os.path.exists(meta_file_path):
-            with open(meta_file_path, "r") as openfile:
-                data = json.load(openfile)
-
-            data["current_page_link"] = current_page_link
-            data["downloaded_repo_links"].append(downloaded_repo_link)
-            data["last_file_number"] = last_file_number
-
-        with open(meta_file_path, "w") as outfile:
-            json.dump(data, outfile)
+    def read_seeds(seeds_file_path):
+        # One url per line, blank lines and lines starting with # are skipped
+        with open(seeds_file_path, "r") as file:
+            return [
+                line.strip()
+                for line in file
+                if line.strip() and not line.strip().startswith("#")
+            ]
 
     @staticmethod
     def downloaded_link(link, downloaded_link_file_path, number):
         with open(downloaded_link_file_path, "a") as file:
             file.write(f"{number} {link}\n")
 
+
+class CheckpointJournal:
+    # meta.json is a snapshot taken when a new page starts, meta.journal gets
+    # one line per collected link after it, so a link costs O(1) to checkpoint.
+    # With seeds, every seed has its own current page and links under
+    # "seeds" and finished seeds are appended to finished_seeds_path.
+
+    def __init__(
+        self,
+        meta_file_path,
+        journal_file_path,
+        links_file_path,
+        flush_interval=50,
+        state_store=None,
+        finished_seeds_path=None,
+    ):
+        self.meta_file_path = meta_file_path
+        self.journal_file_path = journal_file_path
+        self.links_file_path = links_file_path
+        self.finished_seeds_path = finished_seeds_path
+        self.state_store = state_store
+        # Called with the [(number, link), ...] of every flush, once they are
+        # durable, e.g. to stream collected links into the downloader
+        self.on_flush = None
+        self.flush_interval = max(1, flush_interval)
+        self.data = None
+        self.journal_buffer = []
+        self.links_buffer = []
+
+    def load(self):
+        # Same shape as Utility.get_start_url, with the journal replayed on top
+        data = Utility.get_start_url(self.meta_file_path)
+
+        if os.path.exists(self.journal_file_path):
+            with open(self.journal_file_path, "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partially written last line of a crashed run
+                        root_logger.warning("Ignoring truncated checkpoint record")
+                        break
+                    data = CheckpointJournal.apply(data, record)
+
+        self.data = data
+        if data is not None:
+            self.write_snapshot()
+        return data
+
     @staticmethod
-    def empty_meta_file(current_page_link, meta_file_path):
+    def apply(data, record):
+        if data is None:
+            data = {"last_file_number": record["number"]}
+        progress = data
+        if record.get("seed") is not None:
+            progress = data.setdefault("seeds", {}).setdefault(record["seed"], {})
+        progress["current_page_link"] = record["page"]
+        progress.setdefault("downloaded_repo_links", []).append(record["link"])
+        data["last_file_number"] = record["number"]
+        return data
+
+    def add_link(self, current_page_link, repo_link, number, seed=None):
+        record = {"page": current_page_link, "link": repo_link, "number": number}
+        if seed is not None:
+            record["seed"] = seed
+        self.journal_buffer.append(json.dumps(record) + "\n")
+        self.links_buffer.append((number, repo_link))
+        self.data = CheckpointJournal.apply(self.data, record)
+
+        if len(self.journal_buffer) >= self.flush_interval:
+            self.flush()
+
+    def start_page(self, current_page_link, seed=None):
+        # Same semantics as the old empty_meta_file: keep the file number,
+        # forget the links of the previous page
+        self.flush()
+        if self.data is None:
+            self.data = {"last_file_number": 0}
+        progress = {"current_page_link": current_page_link, "downloaded_repo_links": []}
+        if seed is None:
+            self.data.update(progress)
+        else:
+            self.data.setdefault("seeds", {})[seed] = progress
+        self.write_snapshot()
+
+    def finish_seed(self, seed):
+        # The seed's links are durable before it is marked as finished
+        self.flush()
+        with open(self.finished_seeds_path, "a") as file:
+            file.write(f"{seed}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        if self.data:
+            self.data.get("seeds", {}).pop(seed, None)
+
+    def get_finished_seeds(self):
+        if not self.finished_seeds_path or not os.path.exists(self.finished_seeds_path):
+            return set()
+        with open(self.finished_seeds_path, "r") as file:
+            return {line.strip() for line in file if line.strip()}
+
+    def flush(self):
+        if not self.journal_buffer:
+            return
+
+        # Collected links first, then the journal: a crash in between only
+        # collects the links again on resume (script1 skips duplicate urls),
+        # the other order would count them as collected and lose them
+        with open(self.links_file_path, "a") as file:
+            file.writelines(f"{number} {link}\n" for number, link in self.links_buffer)
+            file.flush()
+            os.fsync(file.fileno())
+
+        with open(self.journal_file_path, "a") as file:
+            file.writelines(self.journal_buffer)
+            file.flush()
+            os.fsync(file.fileno())
+
+        if self.state_store:
+            self.state_store.add_collected(self.links_buffer)
+
+        if self.on_flush:
+            self.on_flush(self.links_buffer)
 
-        with open(meta_file_path, "r") as openfile:
-            data = json.load(openfile)
+        self.journal_buffer = []
+        self.links_buffer = []
 
-        data["current_page_link"] = current_page_link
-        data["downloaded_repo_links"] = []
+    def write_snapshot(self):
+        temp_path = f"{self.meta_file_path}.tmp"
+        with open(temp_path, "w") as outfile:
+            json.dump(self.data, outfile)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(temp_path, self.meta_file_path)
 
-        with open(meta_file_path, "w") as outfile:
-            json.dump(data, outfile)
+        # Snapshot now covers everything in the journal
+        open(self.journal_file_path, "w").close()
+
+    def close(self):
+        self.flush()
 
 
 class GetGitHubLinks:
     github_domain = "https://github.com/"
     output_meta_path = BASE_DIR / "outputs/meta.json"
+    output_journal_path = BASE_DIR / "outputs/meta.journal"
+    output_finished_seeds_path = BASE_DIR / "outputs/finished_seeds.txt"
     downloaded_link_file_path = BASE_DIR / "outputs/collected_links.txt"
     webdriver_waiting_time = 10
+    rate_limit_xpath = "//title[contains(text(),'Rate limit')]"
+    next_page_xpath = '//a[@class="next_page"] | //a[text()="Next"]'
+    # Reads a whole page in one WebDriver call: null until the page is
+    # ready, then the ban flag, the hrefs matching arguments[0] and the next
+    # page url
+    read_page_script = """
+        if (window.tabPoolLeaving || document.readyState === "loading") {
+            return null;
+        }
+        function find(xpath) {
+            var result = document.evaluate(
+                xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            var nodes = [];
+            for (var i = 0; i < result.snapshotLength; i++) {
+                nodes.push(result.snapshotItem(i));
+            }
+            return nodes;
+        }
+        var next_page = find(arguments[2])[0];
+        return {
+            banned: find(arguments[1]).length > 0,
+            links: find(arguments[0]).map(function (a) { return a.href; }),
+            next_page: (next_page && next_page.href) || null
+        };
+    """
+    # Starting page request rate, the rate limiter adapts it
+    requests_per_second = 1 / 3
 
     def __init__(
-        self, download_path, total_links_to_download, initial_link, banned_waiting_time
+        self,
+        download_path,
+        total_links_to_download,
+        initial_link,
+        banned_waiting_time,
+        checkpoint_flush_interval=50,
+        http_fetcher=None,
+        state_store=None,
+        rate_limiter=None,
+        browser_profile=None,
+        metrics=None,
+        events=None,
     ):
         root_logger.debug("\n\nStarted getting GitHub repository links...")
-        self.wd = SeleniumWebDriver(download_path=download_path).get_webdriver()
+        self.metrics = metrics or Metrics()
+        self.events = events or EventLog()
+        self.browser_profile = browser_profile or BrowserProfile()
+        self.download_path = download_path
+        self.wd = None
+        # The page being read and the one loading ahead of it
+        self.tabs = None
         self.total_links_to_download = total_links_to_download
         self.initial_link = initial_link
         self.banned_waiting_time = banned_waiting_time
+        self.http_fetcher = http_fetcher
+        # banned_waiting_time is the first backoff after a ban, it doubles on
+        # every ban in a row
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            rate=GetGitHubLinks.requests_per_second, backoff=banned_waiting_time
+        )
         self.first_time = True
+        self.checkpoint = CheckpointJournal(
+            meta_file_path=GetGitHubLinks.output_meta_path,
+            journal_file_path=GetGitHubLinks.output_journal_path,
+            links_file_path=GetGitHubLinks.downloaded_link_file_path,
+            flush_interval=checkpoint_flush_interval,
+            state_store=state_store,
+        )
 
-    def banned(self):
-        try:
-            self.wd.find_element(By.XPATH, "//title[contains(text(),'Rate limit')]")
-            return True
-        except NoSuchElementException:
+    def wait_for_page(self, element_xpath):
+        # Polls until the current tab is rate limited or has links
+        def page_read(wd):
+            page = wd.execute_script(
+                GetGitHubLinks.read_page_script,
+                element_xpath,
+                GetGitHubLinks.rate_limit_xpath,
+                GetGitHubLinks.next_page_xpath,
+            )
+            if page and (page["banned"] or page["links"]):
+                return page
             return False
 
-    def run(self):
+        return WebDriverWait(self.wd, GetGitHubLinks.webdriver_waiting_time).until(
+            page_read
+        )
+
+    @staticmethod
+    def get_callbacks_list():
 
         def as_it_is(param):
             return param
@@ -192,7 +727,7 @@ class GetGitHubLinks:
         def remove_last_value(param):
             return "/".join(param.split("/")[:-1])
 
-        callbacks_list = {
+        return {
             "main": {
                 "repository_page_xpath": '//*[@data-tab-item="org-header-repositories-tab"]/a | //a[@data-tab-item="repositories"]',
                 "element_xpath": '//*[@id="user-repositories-list"]/ul/li/div/div/h3/a[@href] | //*[@id="org-repositories"]//ul/li/div/div/div/h3/a[@href]',
@@ -220,17 +755,23 @@ class GetGitHubLinks:
             },
         }
 
+    def run(self):
+        callbacks_list = GetGitHubLinks.get_callbacks_list()
+
         starting_number = 1
         downloaded_repo_links = None
 
-        data = Utility.get_start_url(GetGitHubLinks.output_meta_path)
+        data = self.checkpoint.load()
 
-        if data:
+        if data and "current_page_link" in data:
             self.first_time = False
             url = data["current_page_link"]
             starting_number = data["last_file_number"] + 1
             downloaded_repo_links = data["downloaded_repo_links"]
         else:
+            # A checkpoint of a seeds crawl only keeps the numbering
+            if data:
+                starting_number = data["last_file_number"] + 1
             url = self.initial_link
 
         key, url = UrlParser(
@@ -247,106 +788,633 @@ class GetGitHubLinks:
             if downloaded_repo_links and downloaded_repo_links[0] == url:
                 root_logger.info(f"{url} already downloaded")
                 return
-            Utility.save_meta(
-                url, url, starting_number, GetGitHubLinks.output_meta_path
-            )
-            Utility.downloaded_link(
-                url, GetGitHubLinks.downloaded_link_file_path, starting_number
-            )
+            self.checkpoint.add_link(url, url, starting_number)
+            self.checkpoint.close()
             root_logger.info("###################### All Done ######################")
             return
 
         meta_data = callbacks_list[key]
 
-        self.wd.get("chrome://downloads")
+        try:
+            self.parse(
+                url=url,
+                starting_number=starting_number,
+                downloaded_repo_links=downloaded_repo_links,
+                meta_data=meta_data,
+            )
+        finally:
+            self.checkpoint.close()
 
-        time.sleep(2)
+        root_logger.info("###################### All Done ######################")
 
-        self.parse(
-            url=url,
-            starting_number=starting_number,
-            downloaded_repo_links=downloaded_repo_links,
-            meta_data=meta_data,
-        )
+    def start_webdriver(self):
+        # Started on first use, a crawl served over HTTP never needs Chrome
+        if self.wd is None:
+            self.wd = SeleniumWebDriver(
+                download_path=self.download_path, browser_profile=self.browser_profile
+            ).get_webdriver()
+            self.tabs = TabPool(self.wd, browser_profile=self.browser_profile)
+            self.wd.get("chrome://downloads")
+            time.sleep(2)
+        return self.wd
+
+    def open_page(self, url):
+        # Starts loading url in a free tab and returns its handle
+        self.start_webdriver()
+        handle = self.tabs.acquire()
+        self.metrics.count("crawl_rate_limit_wait_seconds", self.rate_limiter.acquire())
+        try:
+            self.tabs.load(handle, url, wait=False)
+        except Exception:
+            self.tabs.release(handle, broken=True)
+            raise
+        return handle
+
+    def read_page(self, handle, url, meta_data, first_page):
+        self.wd.switch_to.window(handle)
+
+        # A user or organization page first links to its repositories tab
+        element_xpath = meta_data["element_xpath"]
+        if first_page and meta_data.get("repository_page_xpath"):
+            element_xpath = meta_data["repository_page_xpath"]
 
-        root_logger.info("###################### All Done ######################")
+        while True:
+            with self.metrics.timer("crawl_page_wait"):
+                page = self.wait_for_page(element_xpath)
+            if page["banned"]:
+                banned_time = self.rate_limiter.throttled()
+                self.metrics.count("crawl_bans")
+                self.metrics.count("crawl_ban_seconds", banned_time)
+                self.events.emit(
+                    "crawl", "banned", url=url, seconds=round(banned_time, 3)
+                )
+                root_logger.info(
+                    f"######### BANNED FOR {int(banned_time)}SEC #########"
+                )
+            else:
+                self.rate_limiter.success()
+                if element_xpath == meta_data["element_xpath"]:
+                    break
+                # Same as clicking the tab
+                url = page["links"][0]
+                element_xpath = meta_data["element_xpath"]
+
+            self.metrics.count(
+                "crawl_rate_limit_wait_seconds", self.rate_limiter.acquire()
+            )
+            with self.metrics.timer("crawl_page_load"):
+                self.tabs.load(handle, url)
 
-    def parse(self, url, starting_number, downloaded_repo_links, meta_data):
-        root_logger.info(f"Scraping page url ::: {url}")
+        href_wrapper = meta_data["href_wrapper"]
 
-        self.wd.execute_script("window.open()")
-        self.wd.switch_to.window(self.wd.window_handles[-1])
-        self.wd.get(url)
+        res = [href_wrapper(link) for link in page["links"]]
+        root_logger.debug(f"Found links on page ::: {len(res)} ")
 
-        if self.banned():
-            root_logger.info(
-                f"######### BANNED FOR {self.banned_waiting_time}SEC #########"
-            )
+        next_page = page["next_page"]
 
-            time.sleep(self.banned_waiting_time)
-            self.wd.switch_to.window(self.wd.window_handles[-1])
-            self.wd.close()
-            self.wd.switch_to.window(self.wd.window_handles[-1])
-            return self.parse(url, starting_number, downloaded_repo_links, meta_data)
+        self.close_page(handle)
 
-        if self.first_time and meta_data.get("repository_page_xpath"):
-            self.first_time = False
-            element_xpath = meta_data["repository_page_xpath"]
-            element = WebDriverWait(
-                self.wd, GetGitHubLinks.webdriver_waiting_time
-            ).until(EC.presence_of_all_elements_located((By.XPATH, element_xpath)))
-            element[0].click()
-
-        element = meta_data["element_xpath"]
-        WebDriverWait(self.wd, GetGitHubLinks.webdriver_waiting_time).until(
-            EC.presence_of_all_elements_located((By.XPATH, element))
-        )
-        repositories = self.wd.find_elements(By.XPATH, element)
+        return res, next_page
 
-        href_wrapper = meta_data["href_wrapper"]
+    def close_page(self, handle, broken=False):
+        self.tabs.release(handle, broken=broken)
 
-        res = [href_wrapper(elem.get_attribute("href")) for elem in repositories]
-        root_logger.debug(f"Found links on page ::: {len(res)} ")
+    def request_page(self, url, meta_data, first_page):
+        # Returns (result, None, started_at) when the HTTP fast path worked,
+        # otherwise (None, handle, started_at) of a tab that is loading url
+        root_logger.info(f"Scraping page url ::: {url}")
+        started_at = time.monotonic()
+        if self.http_fetcher:
+            with self.metrics.timer("crawl_http_fetch"):
+                result = self.http_fetcher.scrape_page(url, meta_data, first_page)
+            if result is not None:
+                self.metrics.count("crawl_http_pages")
+                return result, None, started_at
+            self.metrics.count("crawl_http_fallbacks")
+        return None, self.open_page(url), started_at
+
+    def finish_page(self, pending, url, meta_data, first_page):
+        result, handle, started_at = pending
+        if result is None:
+            try:
+                with self.metrics.timer("crawl_browser_read"):
+                    result = self.read_page(handle, url, meta_data, first_page)
+            except Exception as e:
+                self.close_page(handle, broken=True)
+                self.metrics.count("crawl_page_errors")
+                self.events.emit(
+                    "crawl",
+                    "failed",
+                    url=url,
+                    seconds=round(time.monotonic() - started_at, 3),
+                    error=str(e),
+                )
+                raise
+        self.metrics.count("crawl_pages")
+        self.metrics.count("crawl_links", len(result[0]))
+        self.events.emit(
+            "crawl",
+            "page",
+            url=url,
+            links=len(result[0]),
+            seconds=round(time.monotonic() - started_at, 3),
+            browser=handle is not None,
+        )
+        return result
 
+    def scrape_page(self, url, meta_data, first_page):
+        pending = self.request_page(url, meta_data, first_page)
+        return self.finish_page(pending, url, meta_data, first_page)
+
+    @staticmethod
+    def remove_old_links(res, downloaded_repo_links):
         if downloaded_repo_links:
             root_logger.debug(f"Found old links ::: {len(downloaded_repo_links)} ")
             for repo in downloaded_repo_links:
                 if repo in res:
                     res.remove(repo)
             root_logger.debug(f"Remaining links ::: {len(res)} ")
+        return res
 
-        next_page = None
-        element = '//a[@class="next_page"] | //a[text()="Next"]'
-        try:
-            next_page = self.wd.find_element(By.XPATH, element).get_attribute("href")
-        except NoSuchElementException:
-            pass
+    def parse(self, url, starting_number, downloaded_repo_links, meta_data):
+        # One loop iteration per page. The next page starts loading in its own
+        # tab before the links of the current page are checkpointed.
+        pending = self.request_page(url, meta_data, self.first_time)
 
-        self.wd.switch_to.window(self.wd.window_handles[-1])
-        self.wd.close()
-        self.wd.switch_to.window(self.wd.window_handles[-1])
+        while True:
+            res, next_page = self.finish_page(pending, url, meta_data, self.first_time)
+            self.first_time = False
+            root_logger.debug(f"Rate limiter ::: {self.rate_limiter.report()}")
 
-        for repository_url in res:
+            res = GetGitHubLinks.remove_old_links(res, downloaded_repo_links)
+            downloaded_repo_links = None
 
-            if (
+            next_starting_number = starting_number + len(res)
+            if next_page and not (
                 self.total_links_to_download
-                and starting_number > self.total_links_to_download
+                and next_starting_number > self.total_links_to_download
             ):
+                pending = self.request_page(next_page, meta_data, False)
+            else:
+                next_page = None
+
+            for repository_url in res:
+
+                if (
+                    self.total_links_to_download
+                    and starting_number > self.total_links_to_download
+                ):
+                    return
+                self.checkpoint.add_link(url, repository_url, starting_number)
+                self.events.emit(
+                    "crawl", "collected", repo=repository_url, number=starting_number
+                )
+                starting_number += 1
+
+            if not next_page:
                 return
-            Utility.save_meta(
-                url, repository_url, starting_number, GetGitHubLinks.output_meta_path
+
+            self.checkpoint.start_page(next_page)
+            url = next_page
+
+
+class ParallelGetGitHubLinks:
+    # Crawls many seeds (initial links) with a pool of Chrome instances. Seeds
+    # are normalized, deduplicated and classified up front, then workers pull
+    # page urls from a shared frontier, earlier seeds first. The main thread
+    # commits the pages in (seed, page) order, so numbering and
+    # collected_links.txt come out the same as crawling the seeds one after
+    # another; later seeds are only fetched a few pages ahead. With
+    # ordered=False every page is committed as soon as it is scraped (the
+    # pages of a seed still in order), so a slow seed does not hold back the
+    # others, but numbers depend on timing. Every seed is checkpointed on its
+    # own: a rerun skips finished seeds and resumes the others from their
+    # current page. A page that keeps failing leaves its seed at that page.
+    max_page_attempts = 3
+
+    def __init__(
+        self,
+        download_path,
+        total_links_to_download,
+        initial_links,
+        banned_waiting_time,
+        workers=2,
+        checkpoint_flush_interval=50,
+        use_http_fetcher=False,
+        state_store=None,
+        rate_limiter=None,
+        browser_profile=None,
+        metrics=None,
+        search_partitioner=None,
+        events=None,
+        ordered=True,
+    ):
+        root_logger.debug(
+            f"\n\nStarted getting GitHub repository links with {workers} workers..."
+        )
+        self.total_links_to_download = total_links_to_download
+        self.initial_links = initial_links
+        # Splits big searches into sub-queries, their links are deduplicated
+        self.search_partitioner = search_partitioner
+        self.collected_links = None
+        # One limiter for all workers, they all count against the same limit
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            rate=GetGitHubLinks.requests_per_second, backoff=banned_waiting_time
+        )
+        self.metrics = metrics or Metrics()
+        self.events = events or EventLog()
+        http_fetcher = (
+            HttpPageFetcher(pool_size=workers, rate_limiter=self.rate_limiter)
+            if use_http_fetcher
+            else None
+        )
+        self.workers = [
+            GetGitHubLinks(
+                download_path=download_path,
+                total_links_to_download=total_links_to_download,
+                initial_link=None,
+                banned_waiting_time=banned_waiting_time,
+                http_fetcher=http_fetcher,
+                rate_limiter=self.rate_limiter,
+                browser_profile=browser_profile,
+                metrics=self.metrics,
+                events=self.events,
             )
-            Utility.downloaded_link(
-                repository_url,
-                GetGitHubLinks.downloaded_link_file_path,
-                starting_number,
+            for _ in range(max(1, workers))
+        ]
+        self.checkpoint = CheckpointJournal(
+            meta_file_path=GetGitHubLinks.output_meta_path,
+            journal_file_path=GetGitHubLinks.output_journal_path,
+            links_file_path=GetGitHubLinks.downloaded_link_file_path,
+            flush_interval=checkpoint_flush_interval,
+            state_store=state_store,
+            finished_seeds_path=GetGitHubLinks.output_finished_seeds_path,
+        )
+
+        self.frontier = queue.PriorityQueue()
+        # Scraped pages waiting to be committed
+        self.pages = queue.Queue()
+        self.seeds = []
+        self.stopped = threading.Event()
+
+        self.ordered = ordered
+        # Pages fetched ahead of the one being committed, by (seed, page)
+        self.waiting = {}
+        self.max_buffered_pages = 4 * len(self.workers)
+        self.committing = (0, 0)
+        self.condition = threading.Condition()
+
+    def get_seeds_progress(self, data, finished, url_parser):
+        # {seed: {"current_page_link", "downloaded_repo_links"}} of the seeds
+        # in progress. A checkpoint of a single seed crawl, or of a crawl that
+        # went through the links one after another, is moved to its seed, the
+        # links before it are finished
+        seeds = data.setdefault("seeds", {})
+        if "current_page_link" in data:
+            seed_index = data.pop("current_seed", 0)
+            progress = {
+                "current_page_link": data.pop("current_page_link"),
+                "downloaded_repo_links": data.pop("downloaded_repo_links", []),
+            }
+            links = [url_parser.normalize(link) for link in self.initial_links]
+            if seed_index < len(links):
+                for link in links[:seed_index]:
+                    self.checkpoint.finish_seed(link)
+                    finished.add(link)
+                seeds.setdefault(links[seed_index], progress)
+        return dict(seeds)
+
+    def run(self):
+        callbacks_list = GetGitHubLinks.get_callbacks_list()
+        url_parser = UrlParser(domain=GetGitHubLinks.github_domain)
+
+        starting_number = 1
+        progress = {}
+        finished = self.checkpoint.get_finished_seeds()
+
+        data = self.checkpoint.load()
+        if data:
+            starting_number = data["last_file_number"] + 1
+            progress = self.get_seeds_progress(data, finished, url_parser)
+
+        initial_links = self.initial_links
+        if self.search_partitioner:
+            initial_links = self.search_partitioner.expand(initial_links)
+            # Sub-queries of issues, discussions, ... searches can lead to the
+            # same repository
+            self.collected_links = set()
+            if os.path.exists(GetGitHubLinks.downloaded_link_file_path):
+                with open(GetGitHubLinks.downloaded_link_file_path, "r") as file:
+                    self.collected_links = {
+                        line.split(" ")[-1].strip() for line in file if line.strip()
+                    }
+
+        for key, seed in url_parser.classify_all(initial_links):
+            if seed in finished:
+                continue
+            seed_index = len(self.seeds)
+            self.seeds.append(seed)
+
+            url = seed
+            if seed in progress:
+                url = progress[seed]["current_page_link"]
+                root_logger.info(f"Resuming URL ::: {url}")
+            root_logger.debug(f"Key for URL {seed} ::: {key}")
+
+            if key == "repo":
+                self.pages.put((seed_index, 0, url, [url], None))
+            else:
+                self.frontier.put((seed_index, 0, url, key, url == seed, 1))
+        root_logger.info(
+            f"Starting {len(self.seeds)} seeds, {len(finished)} already finished"
+        )
+
+        threads = [
+            threading.Thread(target=self.work, args=(worker, callbacks_list))
+            for worker in self.workers
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self.commit(starting_number, progress)
+        finally:
+            self.stopped.set()
+            with self.condition:
+                self.condition.notify_all()
+            for _ in threads:
+                self.frontier.put((len(self.seeds), 0, None, None, False, 0))
+            for thread in threads:
+                thread.join()
+            for worker in self.workers:
+                if worker.wd is not None:
+                    worker.wd.quit()
+            self.checkpoint.close()
+
+        root_logger.info("###################### All Done ######################")
+
+    def work(self, worker, callbacks_list):
+        while not self.stopped.is_set():
+            page = self.frontier.get()
+            seed_index, page_index, url, key, first_page, attempt = page
+            if url is None or self.stopped.is_set():
+                return
+
+            if self.ordered and seed_index > self.committing[0]:
+                with self.condition:
+                    # Let later seeds run ahead only up to a bound, the seed
+                    # being committed is always allowed to make progress
+                    if (
+                        self.pages.qsize() + len(self.waiting)
+                        >= self.max_buffered_pages
+                    ):
+                        self.frontier.put(page)
+                        self.condition.wait(timeout=1)
+                        continue
+
+            try:
+                res, next_page = worker.scrape_page(
+                    url, callbacks_list[key], first_page
+                )
+            except Exception as e:
+                if attempt < ParallelGetGitHubLinks.max_page_attempts:
+                    message = f"Scraping {url} failed (attempt {attempt}), retrying"
+                    root_logger.warning(f"{message}. Error: {e}")
+                    self.metrics.count("crawl_page_retries")
+                    self.frontier.put(page[:-1] + (attempt + 1,))
+                    continue
+                message = f"Scraping {url} failed, its seed stops at this page"
+                root_logger.error(f"{message}. Error: {e}")
+                # None marks the failed page, the checkpoint stays at it
+                res, next_page = None, None
+
+            # Queued before the next page is, so the pages of a seed reach the
+            # commit in order
+            self.pages.put((seed_index, page_index, url, res, next_page))
+            if next_page:
+                self.frontier.put(
+                    (seed_index, page_index + 1, next_page, key, False, 1)
+                )
+
+    def next_page_to_commit(self):
+        if not self.ordered:
+            return self.pages.get()
+        # The next page of the seed being committed, the others wait for
+        # their turn
+        while self.committing not in self.waiting:
+            page = self.pages.get()
+            self.waiting[page[:2]] = page
+        with self.condition:
+            page = self.waiting.pop(self.committing)
+            self.condition.notify_all()
+        return page
+
+    def commit(self, starting_number, progress):
+        active_seeds = len(self.seeds)
+        while active_seeds:
+            seed_index, page_index, url, res, next_page = self.next_page_to_commit()
+            seed = self.seeds[seed_index]
+
+            if res is None:
+                # Not finished, the next run resumes the seed from this page
+                if page_index == 0 and seed not in progress:
+                    self.checkpoint.start_page(url, seed=seed)
+                self.metrics.count("crawl_unfinished_seeds")
+                self.committing = (seed_index + 1, 0)
+                active_seeds -= 1
+                continue
+
+            if page_index == 0:
+                # A resumed page is already in the checkpoint with its old links
+                if seed in progress:
+                    res = GetGitHubLinks.remove_old_links(
+                        res, progress[seed]["downloaded_repo_links"]
+                    )
+                else:
+                    self.checkpoint.start_page(url, seed=seed)
+
+            for repository_url in res:
+                if (
+                    self.total_links_to_download
+                    and starting_number > self.total_links_to_download
+                ):
+                    return
+                if self.collected_links is not None:
+                    if repository_url in self.collected_links:
+                        continue
+                    self.collected_links.add(repository_url)
+                self.checkpoint.add_link(url, repository_url, starting_number, seed=seed)
+                self.events.emit(
+                    "crawl", "collected", repo=repository_url, number=starting_number
+                )
+                starting_number += 1
+
+            if next_page:
+                self.checkpoint.start_page(next_page, seed=seed)
+                self.committing = (seed_index, page_index + 1)
+            else:
+                self.checkpoint.finish_seed(seed)
+                self.metrics.count("crawl_seeds")
+                self.committing = (seed_index + 1, 0)
+                active_seeds -= 1
+
+
+class SharedGetGitHubLinks:
+    # Crawls one job with several processes or hosts sharing the project folder
+    # (e.g. on a network filesystem). Page urls are claimed from a LeaseBoard
+    # instead of a local frontier: a worker leases a page, scrapes it, adds the
+    # next page to the board and only then completes it, so the pages of a
+    # dead worker are scraped again once their lease expires. A repository
+    # link is collected by whoever adds it to the links board first, with a
+    # number unique across processes (not consecutive, see
+    # LeaseBoard.next_number). total_links_to_download is not supported.
+
+    def __init__(
+        self,
+        download_path,
+        initial_links,
+        banned_waiting_time,
+        lease_path,
+        workers=1,
+        use_http_fetcher=False,
+        state_store=None,
+        rate_limiter=None,
+        browser_profile=None,
+        metrics=None,
+        poll_interval=5,
+        search_partitioner=None,
+        events=None,
+    ):
+        self.initial_links = initial_links
+        self.search_partitioner = search_partitioner
+        self.state_store = state_store
+        self.poll_interval = poll_interval
+        self.pages = LeaseBoard(pathlib.Path(lease_path) / "pages")
+        self.links = LeaseBoard(pathlib.Path(lease_path) / "links")
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(
+            rate=GetGitHubLinks.requests_per_second, backoff=banned_waiting_time
+        )
+        self.metrics = metrics or Metrics()
+        self.events = events or EventLog()
+        http_fetcher = (
+            HttpPageFetcher(pool_size=workers, rate_limiter=self.rate_limiter)
+            if use_http_fetcher
+            else None
+        )
+        self.workers = [
+            GetGitHubLinks(
+                download_path=download_path,
+                total_links_to_download=None,
+                initial_link=None,
+                banned_waiting_time=banned_waiting_time,
+                http_fetcher=http_fetcher,
+                rate_limiter=self.rate_limiter,
+                browser_profile=browser_profile,
+                metrics=self.metrics,
+                events=self.events,
             )
-            starting_number += 1
+            for _ in range(max(1, workers))
+        ]
+        self.lock = threading.Lock()
 
-        if next_page:
-            time.sleep(3)
-            Utility.empty_meta_file(next_page, GetGitHubLinks.output_meta_path)
-            self.parse(next_page, starting_number, None, meta_data)
+    @staticmethod
+    def get_last_number(links_file_path):
+        last_number = 0
+        if os.path.exists(links_file_path):
+            with open(links_file_path, "r") as file:
+                for line in file:
+                    if line.strip():
+                        last_number = max(last_number, int(line.split(" ")[0]))
+        return last_number
+
+    def run(self):
+        callbacks_list = GetGitHubLinks.get_callbacks_list()
+        url_parser = UrlParser(domain=GetGitHubLinks.github_domain)
+
+        # Kept by the first process only, the others number from the same point
+        self.pages.start_numbers(
+            SharedGetGitHubLinks.get_last_number(
+                GetGitHubLinks.downloaded_link_file_path
+            )
+            + 1
+        )
+        initial_links = self.initial_links
+        if self.search_partitioner:
+            initial_links = self.search_partitioner.expand(initial_links)
+        for key, seed in url_parser.classify_all(initial_links):
+            page = {"url": seed, "key": key, "first_page": True}
+            self.pages.add(json.dumps(page), name=seed)
+
+        threads = [
+            threading.Thread(target=self.work, args=(worker, callbacks_list))
+            for worker in self.workers
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+            # Links added by a process that died before writing them
+            for line in self.links.claims(self.poll_interval):
+                self.write_links([line])
+                self.links.complete(line, name=line.split(" ")[1])
+        finally:
+            for worker in self.workers:
+                if worker.wd is not None:
+                    worker.wd.quit()
+            self.pages.close()
+            self.links.close()
+
+        root_logger.info(f"Pages ::: {self.pages.get_summary()}")
+        root_logger.info("###################### All Done ######################")
+
+    def work(self, worker, callbacks_list):
+        for item in self.pages.claims(self.poll_interval):
+            page = json.loads(item)
+            url = page["url"]
+            if page["key"] == "repo":
+                res, next_page = [url], None
+            else:
+                try:
+                    res, next_page = worker.scrape_page(
+                        url, callbacks_list[page["key"]], page["first_page"]
+                    )
+                except Exception as e:
+                    message = f"Scraping {url} failed, skipping the rest of its pages"
+                    root_logger.error(f"{message}. Error: {e}")
+                    res, next_page = [], None
+
+            if next_page:
+                next_item = {"url": next_page, "key": page["key"], "first_page": False}
+                self.pages.add(json.dumps(next_item), name=next_page)
+            self.collect(res)
+            self.pages.complete(item, name=url)
+
+    def collect(self, links):
+        # The links board item is written before the line, a line left out by
+        # a crash is written by the end of run
+        lines = []
+        for link in links:
+            line = f"{self.pages.next_number()} {link}"
+            if self.links.add(line, name=link):
+                lines.append(line)
+        self.write_links(lines)
+        for line in lines:
+            self.links.complete(line, name=line.split(" ")[1])
+
+    def write_links(self, lines):
+        if not lines:
+            return
+        with self.lock:
+            # One write per page, appends of local processes do not interleave
+            with open(GetGitHubLinks.downloaded_link_file_path, "a") as file:
+                file.write("".join(f"{line}\n" for line in lines))
+        if self.state_store:
+            self.state_store.add_collected([line.split(" ") for line in lines])
+        self.metrics.count("crawl_collected_links", len(lines))
+        for line in lines:
+            number, link = line.split(" ")
+            self.events.emit("crawl", "collected", repo=link, number=int(number))
 
 
 if __name__ == "__main__":
@@ -361,12 +1429,125 @@ if __name__ == "__main__":
 
     ban_waiting_time = 30
 
-    GetGitHubLinks(
-        download_path=path,
-        total_links_to_download=links_to_download,
-        initial_link=LINK,
-        banned_waiting_time=ban_waiting_time,
-    ).run()
+    # Number of collected links buffered before the checkpoint is written
+    checkpoint_flush_interval = 50
+
+    # Chrome instances crawling at the same time, 1 keeps the single browser crawler
+    crawler_workers = 1
+
+    # More initial links, crawled after LINK
+    EXTRA_LINKS = []
+
+    # File with one seed url per line (users, organizations, searches), crawled
+    # instead of LINK and EXTRA_LINKS when it exists
+    SEEDS_FILE = BASE_DIR / "seeds.txt"
+    seeds = [LINK] + EXTRA_LINKS
+    if os.path.exists(SEEDS_FILE):
+        seeds = Utility.read_seeds(SEEDS_FILE)
+
+    # With several seeds: number the links in seed order, the same on every
+    # run. False numbers them as pages come in, a slow seed then does not hold
+    # back the others
+    ordered_commits = True
+
+    # Try plain HTTP before rendering a listing page in Chrome
+    use_http_fetcher = True
+
+    # Also record collected links in the shared SQLite ledger (outputs/state.sqlite3)
+    use_state_store = False
+    state_store = None
+    if use_state_store:
+        state_store = StateStore()
+        state_store.import_text_files()
+
+    # Headless Chrome that skips images, media, fonts and analytics
+    lean_browser = True
+    browser_profile = BrowserProfile.lean() if lean_browser else BrowserProfile()
+
+    # Shared by every request of the crawl, ban_waiting_time is its first backoff
+    rate_limiter = AdaptiveRateLimiter(
+        rate=GetGitHubLinks.requests_per_second, backoff=ban_waiting_time
+    )
+
+    # Split searches with more results than GitHub lists (1000) into sub-queries
+    # by created date, then star count, crawled in parallel. Partitions are kept
+    # in outputs/search_partitions.json
+    partition_searches = False
+    search_partitioner = None
+    if partition_searches:
+        search_partitioner = SearchPartitioner(
+            HttpPageFetcher(rate_limiter=rate_limiter)
+        )
+
+    # Timings and counters, written to outputs/metrics_scraping.json. Set a port
+    # to also serve them at http://127.0.0.1:<port>/metrics (Prometheus)
+    metrics_port = None
+    metrics = Metrics(snapshot_path=BASE_DIR / "outputs/metrics_scraping.json")
+    metrics.start(port=metrics_port)
+
+    # One JSON line per page and collected link (a sample of them, see
+    # EventLog.sample_rates), written to outputs/events_scraping.jsonl
+    events = EventLog(BASE_DIR / "outputs/events_scraping.jsonl").start()
+    atexit.register(metrics.stop)
+    atexit.register(events.stop)
+
+    # Share the crawl with other processes or hosts running this script on the
+    # same project folder (e.g. on a network filesystem): pages and links are
+    # claimed through outputs/leases, the pages of a process that died are
+    # taken over once its lease expires. Delete outputs/leases to start over
+    use_lease_board = False
+
+    if use_lease_board:
+        SharedGetGitHubLinks(
+            download_path=path,
+            initial_links=seeds,
+            banned_waiting_time=ban_waiting_time,
+            lease_path=BASE_DIR / "outputs/leases",
+            workers=crawler_workers,
+            use_http_fetcher=use_http_fetcher,
+            state_store=state_store,
+            rate_limiter=rate_limiter,
+            browser_profile=browser_profile,
+            metrics=metrics,
+            search_partitioner=search_partitioner,
+            events=events,
+        ).run()
+    elif crawler_workers > 1 or len(seeds) > 1 or search_partitioner:
+        ParallelGetGitHubLinks(
+            download_path=path,
+            total_links_to_download=links_to_download,
+            initial_links=seeds,
+            banned_waiting_time=ban_waiting_time,
+            workers=crawler_workers,
+            checkpoint_flush_interval=checkpoint_flush_interval,
+            use_http_fetcher=use_http_fetcher,
+            state_store=state_store,
+            rate_limiter=rate_limiter,
+            browser_profile=browser_profile,
+            metrics=metrics,
+            search_partitioner=search_partitioner,
+            events=events,
+            ordered=ordered_commits,
+        ).run()
+    else:
+        GetGitHubLinks(
+            download_path=path,
+            total_links_to_download=links_to_download,
+            initial_link=seeds[0],
+            banned_waiting_time=ban_waiting_time,
+            checkpoint_flush_interval=checkpoint_flush_interval,
+            http_fetcher=(
+                HttpPageFetcher(rate_limiter=rate_limiter) if use_http_fetcher else None
+            ),
+            state_store=state_store,
+            rate_limiter=rate_limiter,
+            browser_profile=browser_profile,
+            metrics=metrics,
+            events=events,
+        ).run()
+
+    events.stop()
+    metrics.stop()
 
 
 subprocess.run(["pip", "install", "selenium"], capture_output=True)
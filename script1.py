@@ -1,20 +1,30 @@
+import atexit
+import json
 import logging
 import os
 import pathlib
 import re
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-from selenium import webdriver
+import requests
+from requests.adapters import HTTPAdapter
 from logging.handlers import RotatingFileHandler
 
-from selenium.common import JavascriptException, TimeoutException, NoSuchWindowException
+from selenium.common import JavascriptException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support import expected_conditions as EC
 
+from browser import BrowserProfile, TabPool
+from event_log import EventLog, start_log_listener
+from lease_board import LeaseBoard
+from metrics import Metrics
+from rate_limiter import AdaptiveRateLimiter
+from state_store import StateStore
+
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
 
 if not os.path.exists(BASE_DIR / "RepoDownloads"):
@@ -34,11 +44,13 @@ console_log = logging.StreamHandler()
 console_log.setLevel(logging.INFO)
 console_log.setFormatter(formatter)
 
-root_logger.addHandler(rotating_file_log)
-root_logger.addHandler(console_log)
+start_log_listener(root_logger, rotating_file_log, console_log)
 
 
 class Utils:
+    # Output files are appended to from several download workers
+    file_lock = threading.Lock()
+
     @staticmethod
     def get_failed_links():
         failed_link_file_path = BASE_DIR / "outputs/failed_link.txt"
@@ -66,13 +78,13 @@ class Utils:
     @staticmethod
     def save_failed_link(current_page_link, starting_number):
         failed_link_file_path = BASE_DIR / "outputs/failed_link.txt"
-        with open(failed_link_file_path, "a") as file:
+        with Utils.file_lock, open(failed_link_file_path, "a") as file:
             file.write(f"{starting_number} {current_page_link}\n")
 
     @staticmethod
-    def rename_file(old_file_name, new_file_name, file_number):
+    def rename_file(old_file_name, new_file_name, file_number, source_path=None):
         try:
-            old_name = BASE_DIR / "RepoDownloads" / old_file_name
+            old_name = (source_path or BASE_DIR / "RepoDownloads") / old_file_name
             new_name = (
                 BASE_DIR / "RepoDownloads" / f"{new_file_name}_N{file_number}.zip"
             )
@@ -86,6 +98,12 @@ class Utils:
         url = url if url[-1] != "/" else url[:-1]
         return url.split("/")[-2] + "_" + url.split("/")[-1]
 
+    @staticmethod
+    def get_archive_url(url):
+        # Same archive as the "Download ZIP" button, for the default branch
+        url = url if url[-1] != "/" else url[:-1]
+        return f"{url}/archive/HEAD.zip"
+
     @staticmethod
     def read_urls(file_path):
         raw_data = []
@@ -104,118 +122,450 @@ class Utils:
         downloaded_links = Utils.read_urls(file_path=downloaded_link_path)
 
         if downloaded_links:
-            root_logger.info(f"Found downloaded links: {len(downloaded_links)}")
-            links_ = "\n".join([i.replace(" ", " skipping ") for i in downloaded_links])
-            root_logger.info(f"links: {links_}")
+            # Only the count, the links themselves are in downloaded_link.txt
+            root_logger.info(f"Skipping downloaded links: {len(downloaded_links)}")
+
+        # Each downloaded line removes one collected line, in one pass
+        skipped = Counter(downloaded_links)
+        starting_links = []
+        for link in collected_links:
+            if skipped[link] > 0:
+                skipped[link] -= 1
+            else:
+                starting_links.append(link)
 
-        for link in downloaded_links:
-            collected_links.remove(link)
+        return starting_links
 
-        return collected_links
+    @staticmethod
+    def refreshed_archive(file_name):
+        # Read by script2, which unzips these archives again
+        file_path = BASE_DIR / "outputs/refreshed_archives.txt"
+        with Utils.file_lock, open(file_path, "a") as file:
+            file.write(f"{file_name}\n")
 
     @staticmethod
     def downloaded_link(link, number):
         file_path = BASE_DIR / "outputs/downloaded_link.txt"
-        with open(file_path, "a") as file:
+        with Utils.file_lock, open(file_path, "a") as file:
             file.write(f"{number} {link}\n")
 
 
 class CleanUp:
-    def __init__(self, downloaded_link_path):
+    # Builds the set of expected archive names once, then checks RepoDownloads
+    # in a single scandir pass, O(files + links)
+    pattern = re.compile(r"w?_N[0-9]+.zip")
+
+    def __init__(self, downloaded_link_path, dry_run=False):
         message = "Started Cleanup."
         root_logger.debug(message)
 
         folder_path = BASE_DIR / "RepoDownloads"
-        dir_list = os.listdir(folder_path)
-        for file_name in dir_list:
-            if not os.path.isdir(folder_path / str(file_name)):
-                file_name = str(file_name)
-                if not CleanUp.is_file_valid(file_name, downloaded_link_path):
-                    message = f"Removing file : {file_name}."
-                    root_logger.info(message)
-
-                    os.remove(folder_path / file_name)
+        expected_file_names = CleanUp.get_expected_file_names(downloaded_link_path)
 
-    @classmethod
-    def is_file_valid(cls, file_name, downloaded_link_path):
-        pattern = r"w?_N[0-9]+.zip"
+        orphans = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    continue
+                if entry.name.endswith((".zip.part", ".zip.part.etag")):
+                    # Partial download, resumed by HttpZipDownloader
+                    continue
+                if not CleanUp.is_file_valid(entry.name, expected_file_names):
+                    orphans.append(entry.name)
 
-        downloaded_links = Utils.read_urls(downloaded_link_path)
-        for i in range(len(downloaded_links)):
-            number = downloaded_links[i].split(" ")[0]
-            link = downloaded_links[i].split(" ")[1]
-            link = link if link[-1] != "/" else link[:-1]
-            file = f"{link.split('/')[-2]}_{link.split('/')[-1]}_N{number}.zip"
-            downloaded_links[i] = file
+        for file_name in orphans:
+            if dry_run:
+                root_logger.info(f"Would remove file : {file_name}.")
+                continue
+            message = f"Removing file : {file_name}."
+            root_logger.info(message)
 
-        return bool(re.search(pattern, file_name)) and file_name in downloaded_links
+            os.remove(folder_path / file_name)
 
+        root_logger.info(
+            f"Cleanup {'would remove' if dry_run else 'removed'} {len(orphans)} files."
+        )
 
-class DownloadGitZips:
-    def __init__(self, downloaded_link_path, download_path):
-        root_logger.debug("Started downloading GitHub repository links...")
-        self.downloaded_link_path = downloaded_link_path
-        self.downloaded_links = Utils.read_urls(file_path=self.downloaded_link_path)
-        self.wd = DownloadGitZips.get_webdriver(download_path=str(download_path))
+    @staticmethod
+    def get_expected_file_names(downloaded_link_path):
+        expected_file_names = set()
+        for line in Utils.read_urls(downloaded_link_path):
+            number, link = line.split(" ")[:2]
+            link = link if link[-1] != "/" else link[:-1]
+            expected_file_names.add(
+                f"{link.split('/')[-2]}_{link.split('/')[-1]}_N{number}.zip"
+            )
+        return expected_file_names
 
     @classmethod
-    def get_webdriver(cls, download_path):
-        options = Options()
-        options.add_argument("--start-maximized")
-        options.add_experimental_option(
-            "prefs", {"download.default_directory": download_path}
-        )
+    def is_file_valid(cls, file_name, expected_file_names):
+        return bool(cls.pattern.search(file_name)) and file_name in expected_file_names
+
+
+class RepositoryNotFound(Exception):
+    pass
+
+
+class RateLimited(Exception):
+    pass
+
+
+class NotModified(Exception):
+    pass
+
+
+class ArchiveVersions:
+    # ETag of the last archive downloaded for every repository, for GitHub's
+    # archives that is the default branch commit. One JSON line per download,
+    # the last line of a url wins.
+    default_path = BASE_DIR / "outputs/archive_versions.jsonl"
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path or ArchiveVersions.default_path
+        self.lock = threading.Lock()
+        self.versions = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path, "r") as file:
+                for line in file:
+                    try:
+                        version = json.loads(line)
+                    except ValueError:
+                        # Torn last line of a crashed run
+                        continue
+                    self.versions[version["url"]] = version
+
+    def get_etag(self, url):
+        version = self.versions.get(url)
+        return version["etag"] if version else None
+
+    def set(self, url, etag, file_name):
+        version = {"url": url, "etag": etag, "file_name": file_name}
+        with self.lock:
+            self.versions[url] = version
+            with open(self.file_path, "a") as file:
+                file.write(json.dumps(version) + "\n")
+
+
+class HttpZipDownloader:
+    # Streams repository archives straight to RepoDownloads over pooled
+    # connections. Data goes to a .part file first, so an interrupted transfer
+    # is resumed with a Range request instead of starting over. The ETag of
+    # the partial archive is kept next to it (.part.etag) and sent as
+    # If-Range, a changed archive is then sent whole instead of appended.
+    chunk_size = 1024 * 1024
+    request_timeout = 30
+    max_attempts = 3
+    max_rate_limited = 10
+
+    def __init__(
+        self, download_path, pool_size=10, rate_limiter=None, archive_versions=None
+    ):
+        self.download_path = pathlib.Path(download_path)
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.archive_versions = archive_versions
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Content-Length has to match the bytes written to disk
+        self.session.headers["Accept-Encoding"] = "identity"
+
+    def download_file(self, url, file_number, conditional=False):
+        # conditional: raises NotModified when the archive has the ETag of
+        # the last download
+        file_name = f"{Utils.get_repository_name(url)}_N{file_number}.zip"
+        final_path = self.download_path / file_name
+        part_path = self.download_path / f"{file_name}.part"
+        archive_url = Utils.get_archive_url(url)
+        etag = None
+        if conditional and self.archive_versions:
+            etag = self.archive_versions.get_etag(url)
+
+        attempt = 0
+        rate_limited = 0
+        while (
+            attempt < HttpZipDownloader.max_attempts
+            and rate_limited < HttpZipDownloader.max_rate_limited
+        ):
+            self.rate_limiter.acquire()
+            try:
+                complete, new_etag = self.stream_to(archive_url, part_path, etag)
+                if complete:
+                    os.replace(part_path, final_path)
+                    HttpZipDownloader.remove_partial(part_path, keep_data=True)
+                    if self.archive_versions:
+                        self.archive_versions.set(url, new_etag, file_name)
+                    return file_name
+            except RateLimited:
+                # Not counted as an attempt, the limiter waits it out
+                rate_limited += 1
+                root_logger.info(f"Rate limited, {self.rate_limiter.report()}")
+                continue
+            except requests.RequestException as e:
+                message = f"attempt {attempt + 1} | {e.__class__.__name__} | {e}"
+                root_logger.info(f"Error in download_file: {message}")
+            attempt += 1
 
-        return webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()), options=options
-        )
+        return None
 
-    def get_downloaded_filename(self):
+    @staticmethod
+    def get_etag_path(part_path):
+        return part_path.with_name(f"{part_path.name}.etag")
+
+    @staticmethod
+    def get_partial_etag(part_path):
         try:
-            self.wd.switch_to.window(self.wd.window_handles[0])
-        except NoSuchWindowException as e:
-            print(f"Error in get_downloaded_filename: NoSuchWindowException: {e}")
-            return
-        time.sleep(5)
-        while True:
+            with open(HttpZipDownloader.get_etag_path(part_path), "r") as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def remove_partial(part_path, keep_data=False):
+        paths = [HttpZipDownloader.get_etag_path(part_path)]
+        if not keep_data:
+            paths.append(part_path)
+        for path in paths:
             try:
-                # get downloading is in progress
-                in_progress = bool(
-                    self.wd.execute_script(
-                        "return document.querySelector('downloads-manager').shadowRoot.querySelector('#list downloads-item').shadowRoot.querySelector('#progress')"
-                    )
-                )
-                show_in_folder_option_hidden = bool(
-                    self.wd.execute_script(
-                        "return document.querySelector('downloads-manager').shadowRoot.querySelector('#downloadsList downloads-item').shadowRoot.querySelector('#quick-show-in-folder').hidden"
-                    )
-                )
-                is_failed_error_shown = bool(
-                    self.wd.execute_script(
-                        "return document.querySelector('downloads-manager').shadowRoot.querySelector('#list downloads-item').shadowRoot.querySelector('#tag').innerText"
-                    )
-                )
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stream_to(self, archive_url, part_path, etag=None):
+        # Returns (complete, ETag of the archive)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        partial_etag = HttpZipDownloader.get_partial_etag(part_path) if offset else None
+        if offset and (
+            # Only a strong validator proves the rest belongs to the same archive
+            partial_etag is None
+            or partial_etag.startswith("W/")
+            # Partial copy of the archive we already have, check for changes
+            or partial_etag == etag
+        ):
+            HttpZipDownloader.remove_partial(part_path)
+            offset = 0
+
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = partial_etag
+        elif etag:
+            headers["If-None-Match"] = etag
+
+        with self.session.get(
+            archive_url,
+            headers=headers,
+            stream=True,
+            timeout=HttpZipDownloader.request_timeout,
+        ) as response:
+            if self.rate_limiter.update_from_headers(
+                response.status_code, response.headers
+            ):
+                raise RateLimited(archive_url)
+
+            if response.status_code == 404:
+                raise RepositoryNotFound(archive_url)
+
+            if response.status_code == 304:
+                self.rate_limiter.success()
+                raise NotModified(archive_url)
+
+            if response.status_code == 416:
+                # Stale partial file, start again
+                HttpZipDownloader.remove_partial(part_path)
+                return False, None
+
+            response.raise_for_status()
+
+            new_etag = response.headers.get("ETag")
+            expected_size = None
+            if response.status_code == 206:
+                total = response.headers.get("Content-Range", "").split("/")[-1]
+                expected_size = int(total) if total.isdigit() else None
+                mode = "ab"
+                new_etag = new_etag or partial_etag
+            else:
+                # Whole archive, also when If-Range did not match
+                content_length = response.headers.get("Content-Length")
+                expected_size = int(content_length) if content_length else None
+                mode = "wb"
+                etag_path = HttpZipDownloader.get_etag_path(part_path)
+                if new_etag:
+                    with open(etag_path, "w") as file:
+                        file.write(new_etag)
+                elif os.path.exists(etag_path):
+                    os.remove(etag_path)
+
+            with open(part_path, mode) as file:
+                for chunk in response.iter_content(HttpZipDownloader.chunk_size):
+                    file.write(chunk)
+
+        self.rate_limiter.success()
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            root_logger.info(
+                f"Incomplete download {part_path.name}: {size} of {expected_size} bytes"
+            )
+            return False, None
+        return True, new_etag
 
-                if is_failed_error_shown:
-                    return None
 
-                # check if download progress bar is completed (otherwise the script will keep waiting)
-                if not in_progress and not show_in_folder_option_hidden:
-                    # return the file name once the download is completed
-                    filename = self.wd.execute_script(
-                        "return document.querySelector('downloads-manager').shadowRoot.querySelector('#downloadsList downloads-item').shadowRoot.querySelector('#file-link').text"
-                    )
-                    return filename
+class DownloadWatcher:
+    # Waits for a Chrome download by watching a directory only one driver
+    # downloads into: the partial file (.crdownload) turning into the final
+    # file marks completion. Checks are local scandir calls, no WebDriver
+    # round-trips.
+    poll_interval = 0.05
+    start_timeout = 30
+    stall_timeout = 120
+    partial_suffixes = (".crdownload", ".tmp")
+    partial_prefixes = (".com.google.Chrome.", ".org.chromium.Chromium.")
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def is_partial(file_name):
+        return file_name.endswith(
+            DownloadWatcher.partial_suffixes
+        ) or file_name.startswith(DownloadWatcher.partial_prefixes)
+
+    def clear(self):
+        # Leftovers of an earlier failed download
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    os.remove(entry.path)
+
+    def wait(self):
+        # Returns (file name, None) once finished, or (None, failure reason)
+        started_at = last_change = time.time()
+        last_size = None
 
-                time.sleep(1)
-            except JavascriptException as e:
-                print(f"Error in get_downloaded_filename: JavascriptException: {e}")
+        while True:
+            partial = final = None
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    if DownloadWatcher.is_partial(entry.name):
+                        partial = entry
+                    else:
+                        final = entry.name
+
+            if final and not partial:
+                return final, None
+
+            now = time.time()
+            if partial:
+                try:
+                    size = partial.stat().st_size
+                except FileNotFoundError:
+                    # Renamed to the final name in between, look again
+                    continue
+                if size != last_size:
+                    last_size, last_change = size, now
+                elif now - last_change > DownloadWatcher.stall_timeout:
+                    return None, f"download stalled at {size} bytes"
+            elif last_size is not None:
+                return None, "download was cancelled or failed in the browser"
+            elif now - started_at > DownloadWatcher.start_timeout:
+                return None, "download did not start"
+
+            time.sleep(DownloadWatcher.poll_interval)
+
+
+class DownloadGitZips:
+    # Chrome downloads land here and are moved to RepoDownloads once renamed
+    browser_download_path = BASE_DIR / "outputs/browser_downloads"
+    # Errors of a claimed link before it is recorded as failed
+    max_claim_attempts = 3
+
+    def __init__(
+        self,
+        downloaded_link_path,
+        download_path,
+        http_downloader=None,
+        workers=1,
+        state_store=None,
+        rate_limiter=None,
+        browser_profile=None,
+        metrics=None,
+        refresh=False,
+        lease_board=None,
+        events=None,
+    ):
+        root_logger.debug("Started downloading GitHub repository links...")
+        self.downloaded_link_path = downloaded_link_path
+        # url -> number of its archive. The first line of a url is its
+        # download, later ones are skips under the numbers it was collected
+        # again with
+        self.downloaded_links = {}
+        for line in Utils.read_urls(file_path=self.downloaded_link_path):
+            self.downloaded_links.setdefault(line.split(" ")[-1], line.split(" ")[0])
+        self.download_path = pathlib.Path(download_path)
+        self.http_downloader = http_downloader
+        self.workers = max(1, workers)
+        self.state_store = state_store
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.browser_profile = browser_profile or BrowserProfile()
+        self.metrics = metrics or Metrics()
+        self.events = events or EventLog()
+        # Already downloaded repositories are checked for changes too
+        self.refresh = refresh and http_downloader is not None
+        if refresh and not self.refresh:
+            root_logger.warning("Refresh needs the HTTP downloader, skipping it.")
+        # Splits the links with other processes or hosts, see run
+        self.lease_board = lease_board
+        self.claim_errors = {}
+        self.claim_lock = threading.Lock()
+        # Called with the file name of every new archive in RepoDownloads
+        self.on_downloaded = None
+        # Every worker thread drives its own Chrome with its own download
+        # directory, so whatever shows up there is that worker's download
+        self.local = threading.local()
+        self.webdrivers = []
+
+    @property
+    def wd(self):
+        return getattr(self.local, "wd", None)
+
+    def get_webdriver(self, download_path):
+        return self.browser_profile.get_webdriver(download_path=download_path)
+
+    def start_webdriver(self):
+        # Started on first use, with the HTTP downloader only for a fallback
+        if self.wd is None:
+            with Utils.file_lock:
+                worker_number = len(self.webdrivers)
+                self.webdrivers.append(None)
+            worker_name = str(worker_number)
+            if self.lease_board:
+                # The folder is shared with the other processes
+                worker_name = f"{self.lease_board.owner}-{worker_number}"
+            worker_path = DownloadGitZips.browser_download_path / worker_name
+            self.local.watcher = DownloadWatcher(worker_path)
+            self.local.wd = self.get_webdriver(
+                download_path=str(worker_path)
+            )
+            self.webdrivers[worker_number] = self.local.wd
+            self.local.tabs = TabPool(
+                self.local.wd, browser_profile=self.browser_profile
+            )
+        return self.wd
 
     def download_file(self, url, file_number):
+        self.local.watcher.clear()
+        tabs = self.local.tabs
+        handle = None
         try:
-            self.wd.execute_script("window.open()")
-            self.wd.switch_to.window(self.wd.window_handles[-1])
-            self.wd.get(url)
+            handle = tabs.acquire()
+            self.metrics.count(
+                "download_rate_limit_wait_seconds", self.rate_limiter.acquire()
+            )
+            with self.metrics.timer("download_page_load"):
+                tabs.load(handle, url)
             element = "//react-partial/div/div/div[2]/div[2]/button"
             WebDriverWait(self.wd, 2).until(
                 EC.presence_of_element_located((By.XPATH, element))
@@ -229,69 +579,273 @@ class DownloadGitZips:
             self.wd.find_element(By.XPATH, element).click()
         except JavascriptException as e:
             root_logger.info(f"Error in download_file: JavascriptException | {e}")
+            DownloadGitZips.release_tab(tabs, handle, broken=True)
             return
         except TimeoutException as e:
             root_logger.info(f"Error in download_file: TimeoutException | {e}")
+            # The repository page has no download button, the tab is fine
+            DownloadGitZips.release_tab(tabs, handle)
             raise TimeoutException
         except Exception as e:
             root_logger.info(f"Error in download_file: Exception | {e}")
+            DownloadGitZips.release_tab(tabs, handle, broken=True)
             return
 
-        file_name = self.get_downloaded_filename()
-        time.sleep(2)
-        self.wd.switch_to.window(self.wd.window_handles[-1])
-        self.wd.close()
-        self.wd.switch_to.window(self.wd.window_handles[0])
+        with self.metrics.timer("download_poll"):
+            file_name, reason = self.local.watcher.wait()
+        if file_name is None:
+            root_logger.info(f"Error in download_file: {reason}")
+        DownloadGitZips.release_tab(tabs, handle)
 
         return file_name
 
-    def run(self, repository_urls):
-        done_urls = []
-        self.wd.get("chrome://downloads")
+    @staticmethod
+    def release_tab(tabs, handle, broken=False):
+        if handle is not None:
+            tabs.release(handle, broken=broken)
+
+    def download_repository(self, url, file_number):
+        if self.http_downloader:
+            with self.metrics.timer("download_http"):
+                file_name = self.http_downloader.download_file(url, file_number)
+            if file_name is not None:
+                return file_name
+            self.metrics.count("download_http_fallbacks")
+            root_logger.info("Direct download failed. Falling back to the browser...")
+
+        self.start_webdriver()
+        with self.metrics.timer("download_browser"):
+            file_name = self.download_file(url=url, file_number=file_number)
+        if file_name is None:
+            return None
+
+        with self.metrics.timer("download_rename"):
+            new_file_name = Utils.get_repository_name(url)
+            new_file_name = Utils.rename_file(
+                file_name, new_file_name, file_number, self.local.watcher.directory
+            )
+            if new_file_name is not None:
+                os.replace(
+                    self.local.watcher.directory / new_file_name,
+                    self.download_path / new_file_name,
+                )
+        return new_file_name
 
-        for repository_url in repository_urls:
-            starting_number, repository_url = repository_url.split(" ")
+    def download(self, repository_url, starting_number, first_occurrence=None):
+        root_logger.info(f"Downloading {repository_url} ...")
+        started_at = time.monotonic()
 
-            root_logger.info(f"Downloading {repository_url} ...")
+        already_downloaded = repository_url in self.downloaded_links
+        if first_occurrence is not None:
+            # Same url earlier in the list, wait for that download
+            already_downloaded = already_downloaded or first_occurrence.result()
 
-            if repository_url in self.downloaded_links + done_urls:
-                root_logger.info("This url is already downloaded. Skipping...")
-                Utils.downloaded_link(repository_url, starting_number)
-                continue
+        if already_downloaded and self.refresh and first_occurrence is None:
+            # Under the number of the archive on disk, the one CleanUp keeps
+            return self.refresh_repository(
+                repository_url, self.downloaded_links[repository_url]
+            )
 
-            try:
-                file_name = self.download_file(
+        if already_downloaded:
+            root_logger.info("This url is already downloaded. Skipping...")
+            self.metrics.count("download_skipped")
+            self.record_downloaded(repository_url, starting_number, None, started_at)
+            return True
+
+        try:
+            with self.metrics.timer("download_repo"):
+                new_file_name = self.download_repository(
                     url=repository_url, file_number=starting_number
                 )
 
-                if file_name is None:
-                    message = "File not downloaded properly."
-                    root_logger.error(f"File downloading failed. Error: {message}")
-                    Utils.save_failed_link(repository_url, starting_number)
-                    continue
+            if new_file_name is None:
+                message = "File not downloaded properly."
+                root_logger.error(f"File downloading failed. Error: {message}")
+                self.record_failed(repository_url, starting_number, started_at)
+                return False
 
-                new_file_name = Utils.get_repository_name(repository_url)
-                new_file_name = Utils.rename_file(
-                    file_name, new_file_name, starting_number
+            message = f"File downloaded successfully with name {new_file_name}"
+            root_logger.info(message)
+
+            self.record_downloaded(
+                repository_url, starting_number, new_file_name, started_at
+            )
+            return True
+        except (TimeoutException, RepositoryNotFound):
+            message = f"{repository_url} is invalid"
+            root_logger.error(f"File downloading failed. Error: {message}")
+            self.record_failed(repository_url, starting_number, started_at)
+            return False
+
+    def refresh_repository(self, repository_url, starting_number):
+        # Downloads the archive again only when it changed since the last
+        # download, script2 then unzips it again
+        started_at = time.monotonic()
+        try:
+            with self.metrics.timer("download_refresh"):
+                file_name = self.http_downloader.download_file(
+                    repository_url, starting_number, conditional=True
                 )
+        except NotModified:
+            root_logger.info("Repository has not changed. Skipping...")
+            self.metrics.count("download_unchanged")
+            self.events.emit(
+                "download",
+                "unchanged",
+                repo=repository_url,
+                number=int(starting_number),
+                seconds=round(time.monotonic() - started_at, 3),
+            )
+            return True
+        except RepositoryNotFound:
+            file_name = None
 
-                if new_file_name is None:
-                    message = "File not downloaded properly."
-                    root_logger.error(f"File downloading failed. Error: {message}")
-                    Utils.save_failed_link(repository_url, starting_number)
-                    continue
+        if file_name is None:
+            root_logger.error(
+                f"Refreshing {repository_url} failed. Keeping the old archive."
+            )
+            self.metrics.count("download_refresh_failed")
+            self.events.emit(
+                "download",
+                "refresh_failed",
+                repo=repository_url,
+                number=int(starting_number),
+                seconds=round(time.monotonic() - started_at, 3),
+            )
+            return True
+
+        root_logger.info(f"Repository has changed. Downloaded again as {file_name}")
+        size = os.path.getsize(self.download_path / file_name)
+        self.metrics.count("download_refreshed")
+        self.metrics.count("download_bytes", size)
+        self.events.emit(
+            "download",
+            "refreshed",
+            repo=repository_url,
+            number=int(starting_number),
+            seconds=round(time.monotonic() - started_at, 3),
+            bytes=size,
+            file=file_name,
+        )
+        Utils.refreshed_archive(file_name)
+        if self.state_store:
+            self.state_store.mark_downloaded(starting_number, repository_url, file_name)
+            self.state_store.mark_refreshed(file_name)
+        if self.on_downloaded:
+            self.on_downloaded(file_name)
+        return True
+
+    def download_claim(self, line):
+        # A failed download is recorded like without leases. An error gives
+        # the link back to be claimed again, up to max_claim_attempts, then it
+        # is recorded as failed too: only a dead process hands its links to
+        # another one, through lease expiry
+        starting_number, repository_url = line.split(" ")
+        try:
+            self.download(repository_url, starting_number)
+        except Exception as e:
+            with self.claim_lock:
+                attempts = self.claim_errors.get(line, 0) + 1
+                self.claim_errors[line] = attempts
+            if attempts < DownloadGitZips.max_claim_attempts:
+                message = f"Downloading {repository_url} failed (attempt {attempts})"
+                root_logger.error(f"{message}, retrying. Error: {e}")
+                self.lease_board.release(line, name=repository_url)
+                return
+            message = f"Downloading {repository_url} failed {attempts} times"
+            root_logger.error(f"{message}, giving up. Error: {e}")
+            self.record_failed(repository_url, starting_number)
+        self.lease_board.complete(line, name=repository_url)
+
+    def record_downloaded(
+        self, repository_url, starting_number, file_name, started_at=None
+    ):
+        event = {"repo": repository_url, "number": int(starting_number)}
+        if started_at is not None:
+            event["seconds"] = round(time.monotonic() - started_at, 3)
+        if file_name:
+            size = os.path.getsize(self.download_path / file_name)
+            self.metrics.count("download_repos")
+            self.metrics.count("download_bytes", size)
+            self.events.emit(
+                "download", "downloaded", bytes=size, file=file_name, **event
+            )
+        else:
+            self.events.emit("download", "skipped", **event)
+        Utils.downloaded_link(repository_url, starting_number)
+        if self.state_store:
+            self.state_store.mark_downloaded(starting_number, repository_url, file_name)
+        if self.on_downloaded and file_name:
+            self.on_downloaded(file_name)
+
+    def record_failed(self, repository_url, starting_number, started_at=None):
+        self.metrics.count("download_failed")
+        event = {"repo": repository_url, "number": int(starting_number)}
+        if started_at is not None:
+            event["seconds"] = round(time.monotonic() - started_at, 3)
+        self.events.emit("download", "failed", **event)
+        Utils.save_failed_link(repository_url, starting_number)
+        if self.state_store:
+            self.state_store.mark_download_failed(starting_number, repository_url)
 
-                message = f"File downloaded successfully with name {new_file_name}"
-                root_logger.info(message)
+    def run(self, repository_urls):
+        # repository_urls can be any iterable of "<number> <url>" lines, it is
+        # only read as fast as the workers download
+        first_occurrences = {}
+        in_flight = threading.BoundedSemaphore(2 * self.workers)
+
+        if self.lease_board:
+            # Every process adds all its links (once per url whoever adds it
+            # first) and downloads the ones it claims
+            for line in repository_urls:
+                self.lease_board.add(line, name=line.split(" ")[1])
+            repository_urls = self.lease_board.claims()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = []
+            for line in repository_urls:
+                starting_number, repository_url = line.split(" ")
+                in_flight.acquire()
+                if self.lease_board:
+                    # The board already hands out every url once
+                    future = executor.submit(self.download_claim, line)
+                else:
+                    future = executor.submit(
+                        self.download,
+                        repository_url,
+                        starting_number,
+                        first_occurrences.get(repository_url),
+                    )
+                    first_occurrences.setdefault(repository_url, future)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
 
-                Utils.downloaded_link(repository_url, starting_number)
-                done_urls.append(repository_url)
-            except TimeoutException:
-                message = f"{repository_url} is invalid"
-                root_logger.error(f"File downloading failed. Error: {message}")
-                Utils.save_failed_link(repository_url, starting_number)
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+                for wd in self.webdrivers:
+                    if wd is not None:
+                        wd.quit()
+                if self.lease_board:
+                    self.lease_board.close()
 
         root_logger.info("############## COMPLETED DOWNLOADING ##############")
+        root_logger.info(f"Rate limiter: {self.rate_limiter.report()}")
+
+        if self.state_store:
+            counts = self.state_store.get_summary()
+            summary = f"""
+########################################## SUMMARY ##########################################
+collected links: {counts["collected"]}
+downloaded_links_count: {counts["downloaded"]}
+failed_links_count: {counts["download_failed"]}
+downloaded_links_count + failed_links_count : {counts["downloaded"] + counts["download_failed"]}
+        """
+            root_logger.info(summary)
+            return
 
         collected_links_count = Utils.get_collected_links()
         downloaded_links_count = Utils.get_downloaded_links()
@@ -318,24 +872,102 @@ if __name__ == "__main__":
     downloaded_file_names_path = BASE_DIR / "outputs/downloaded_file_names.txt"
     repos_download_folder_path = BASE_DIR / "RepoDownloads"
 
+    # Stream archives over HTTP, Chrome is only used when that fails
+    use_http_downloader = True
+
+    # Repositories downloaded at the same time (each worker gets its own Chrome)
+    download_workers = 4
+
+    # Headless Chrome that skips images, media, fonts and analytics
+    lean_browser = True
+
+    # Also check every downloaded repository for changes: an unchanged archive
+    # is answered with 304 Not Modified, a changed one is downloaded again and
+    # unzipped again by script2. Needs the HTTP downloader
+    refresh = False
+
+    # Shared by all download requests, adapts the request rate to GitHub's limits
+    rate_limiter = AdaptiveRateLimiter()
+
+    # Timings and counters, written to outputs/metrics_downloading.json. Set a
+    # port to also serve them at http://127.0.0.1:<port>/metrics (Prometheus)
+    metrics_port = None
+    metrics = Metrics(snapshot_path=BASE_DIR / "outputs/metrics_downloading.json")
+    metrics.start(port=metrics_port)
+
+    # One JSON line per repository (downloaded, skipped, failed, ...) with its
+    # duration and size, written to outputs/events_downloading.jsonl
+    events = EventLog(BASE_DIR / "outputs/events_downloading.jsonl").start()
+    atexit.register(metrics.stop)
+    atexit.register(events.stop)
+
+    # Read and record progress in the shared SQLite ledger (outputs/state.sqlite3)
+    use_state_store = False
+    state_store = None
+    if use_state_store:
+        state_store = StateStore()
+        state_store.import_text_files()
+
     root_logger.debug(
         "\n\n#########################################################################################\n\n"
     )
 
-    # This will remove all unfinished zip files
-    CleanUp(downloaded_link_file_path)
-
-    links = Utils.get_starting_links(
-        collected_links_path=collected_links_file_path,
-        downloaded_link_path=downloaded_link_file_path,
-    )
+    # Share the downloads with other processes or hosts running this script on
+    # the same project folder (e.g. on a network filesystem): each link is
+    # claimed by one of them through outputs/leases/downloads, the links of a
+    # process that died are taken over once its lease expires
+    use_lease_board = False
+    lease_board = None
+    if use_lease_board:
+        lease_board = LeaseBoard(BASE_DIR / "outputs/leases/downloads")
+
+    # Only print what the cleanup would remove, without removing it
+    cleanup_dry_run = False
+
+    # This will remove all unfinished zip files. Not with a lease board, the
+    # zips of the other processes are not recorded yet
+    if not lease_board:
+        CleanUp(downloaded_link_file_path, dry_run=cleanup_dry_run)
+
+    if lease_board:
+        links = Utils.read_urls(file_path=collected_links_file_path)
+    elif refresh:
+        links = Utils.read_urls(file_path=collected_links_file_path)
+    elif state_store:
+        links = state_store.get_pending_downloads()
+    else:
+        links = Utils.get_starting_links(
+            collected_links_path=collected_links_file_path,
+            downloaded_link_path=downloaded_link_file_path,
+        )
     root_logger.info(f"\n\nTotal links found to start download: {len(links)}")
 
     DownloadGitZips(
         download_path=repos_download_folder_path,
         downloaded_link_path=downloaded_link_file_path,
+        http_downloader=(
+            HttpZipDownloader(
+                download_path=repos_download_folder_path,
+                pool_size=download_workers,
+                rate_limiter=rate_limiter,
+                archive_versions=ArchiveVersions(),
+            )
+            if use_http_downloader
+            else None
+        ),
+        workers=download_workers,
+        state_store=state_store,
+        rate_limiter=rate_limiter,
+        browser_profile=BrowserProfile.lean() if lean_browser else BrowserProfile(),
+        metrics=metrics,
+        refresh=refresh,
+        lease_board=lease_board,
+        events=events,
     ).run(links)
 
+    events.stop()
+    metrics.stop()
+
     root_logger.debug(
         "\n\n#########################################################################################\n\n"
     )
@@ -1,10 +1,26 @@
+import atexit
 import logging
 import os
 import pathlib
 import shutil
 import zipfile
+import fnmatch
+import hashlib
+import mmap
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from logging.handlers import RotatingFileHandler
 
+from event_log import EventLog, start_log_listener
+from metrics import Metrics
+from state_store import StateStore
+
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
 
 log_file = BASE_DIR / 'outputs/unzip.log'
@@ -21,8 +37,7 @@ console_log = logging.StreamHandler()
 console_log.setLevel(logging.INFO)
 console_log.setFormatter(formatter)
 
-root_logger.addHandler(rotating_file_log)
-root_logger.addHandler(console_log)
+start_log_listener(root_logger, rotating_file_log, console_log)
 
 
 class Utils:
@@ -32,58 +47,384 @@ class Utils:
         with open(failed_link_file_path, 'a') as file:
             file.write(f'{unzipped_file_name}\n')
 
+    @staticmethod
+    def save_truncated_archive(unzipped_file_name, skipped_files):
+        # Archives only partly unzipped because of max_archive_size
+        truncated_file_path = BASE_DIR / 'outputs/unzip_truncated.txt'
+        with open(truncated_file_path, 'a') as file:
+            file.write(f'{unzipped_file_name} {skipped_files}\n')
+
+
+class MemberFilter:
+    # Decides which archive members are written by a selective extraction.
+    # Paths are relative to the archive's top level folder. A pattern ending
+    # with '/' matches a folder anywhere in the path (e.g. 'node_modules/').
+    def __init__(
+        self, include=None, exclude=None, max_file_size=None, max_archive_size=None
+    ):
+        self.include = include or []
+        self.exclude = exclude or []
+        self.max_file_size = max_file_size
+        self.max_archive_size = max_archive_size
+
+    @staticmethod
+    def matches(path, pattern):
+        parts = path.split('/')
+        if pattern.endswith('/'):
+            return any(fnmatch.fnmatch(part, pattern[:-1]) for part in parts[:-1])
+        return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(parts[-1], pattern)
+
+    def is_wanted(self, path, size):
+        if self.max_file_size is not None and size > self.max_file_size:
+            return False
+        if any(MemberFilter.matches(path, pattern) for pattern in self.exclude):
+            return False
+        if not self.include:
+            return True
+        return any(MemberFilter.matches(path, pattern) for pattern in self.include)
+
+
+class ContentStore:
+    # Content addressed store of extracted files, shared by all archives.
+    # Every content is kept once under <store_path>/<2 hex>/<sha256> and the
+    # files in the <owner>_<repo>_N<number> folders are hardlinks to it, so
+    # identical files of forks (licenses, vendored libraries) take disk space
+    # once. Members are hashed while they are read from the archive, a member
+    # whose content is already stored is linked without being written.
+    # Hardlinked files are shared: editing one edits all its copies.
+    buffer_size = 8388608
+    chunk_size = 1048576
+
+    def __init__(self, store_path, min_size=1):
+        self.store_path = pathlib.Path(store_path)
+        # Smaller files are written as they are
+        self.min_size = min_size
+
+    def get_object_path(self, digest):
+        return self.store_path / digest[:2] / digest
+
+    @staticmethod
+    def link(object_path, target_path):
+        # Replaces target_path (if any) with a hardlink to object_path
+        temp_path = f'{target_path}.link'
+        try:
+            os.link(object_path, temp_path)
+        except OSError:
+            # Not stored yet, too many links or no hardlinks on this filesystem
+            return False
+        os.replace(temp_path, target_path)
+        return True
+
+    def write(self, zip_ref, member, target_path):
+        # Returns the bytes that were not written again
+        if member.file_size < self.min_size:
+            with zip_ref.open(member) as source:
+                with open(target_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+            return 0
+
+        if member.file_size <= ContentStore.buffer_size:
+            with zip_ref.open(member) as source:
+                content = source.read()
+            object_path = self.get_object_path(hashlib.sha256(content).hexdigest())
+            if ContentStore.link(object_path, target_path):
+                return member.file_size
+            with open(target_path, 'wb') as target:
+                target.write(content)
+        else:
+            # Too big to be held in memory, hashed while it is written
+            hasher = hashlib.sha256()
+            with zip_ref.open(member) as source:
+                with open(target_path, 'wb') as target:
+                    while True:
+                        chunk = source.read(ContentStore.chunk_size)
+                        if not chunk:
+                            break
+                        hasher.update(chunk)
+                        target.write(chunk)
+            object_path = self.get_object_path(hasher.hexdigest())
+            if ContentStore.link(object_path, target_path):
+                return member.file_size
+
+        os.makedirs(object_path.parent, exist_ok=True)
+        try:
+            os.link(target_path, object_path)
+        except FileExistsError:
+            # Stored by another worker in the meantime
+            if ContentStore.link(object_path, target_path):
+                return member.file_size
+        except OSError:
+            pass
+        return 0
+
+    def prune(self):
+        # Removes contents no extracted file links to anymore, e.g. after the
+        # cleanup or a refreshed archive removed their folders
+        if not os.path.exists(self.store_path):
+            return 0
+        removed = 0
+        for folder in os.scandir(self.store_path):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.stat().st_nlink == 1:
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
 
 class UnZip:
-    def __init__(self, zips_input_path):
+    # Archives script1 downloaded again because the repository changed
+    refreshed_archives_path = BASE_DIR / 'outputs/refreshed_archives.txt'
+
+    def __init__(
+        self,
+        zips_input_path,
+        cleanup_dry_run=False,
+        state_store=None,
+        member_filter=None,
+        metrics=None,
+        content_store=None,
+        events=None,
+    ):
         self.zips_path = zips_input_path
+        self.state_store = state_store
+        self.member_filter = member_filter
+        self.metrics = metrics or Metrics()
+        self.events = events or EventLog()
+        self.content_store = content_store
+        self.saved_bytes = 0
+        # Results of the worker processes are recorded one at a time
+        self.record_lock = threading.Lock()
+        self.refreshed = UnZip.get_refreshed_archives()
         self.already_unzipped_files, self.files = self.get_all_zips()
-        self.clean_up()
+        self.clean_up(dry_run=cleanup_dry_run)
 
-    def run(self):
+    def run(self, workers=1, file_names=None):
+        # file_names can be any iterable of archive names (e.g. fed while they
+        # are downloaded), by default the zips found in zips_path
         root_logger.info('Starting Unzipping.')
-        root_logger.info(f'Found {len(self.files)} zips to be unzipped.')
-        for file_name in self.files:
-            root_logger.debug(f'{file_name} is unzipping...')
-
-            try:
-                with zipfile.ZipFile(self.zips_path / str(file_name), 'r') as zip_ref:
-                    unzipped_file_name = zip_ref.infolist()[0].filename[:-1]
-                    zip_ref.extractall(self.zips_path)
-                    UnZip.rename_file(self.zips_path, unzipped_file_name, file_name)
-            except Exception:
-                message = f'File not unzipped properly. {file_name} is Corrupted file!'
-                root_logger.error(f"File unzip failed. Error: {message}")
-                Utils.save_failed_link(file_name)
+        if file_names is None:
+            root_logger.info(f'Found {len(self.files)} zips to be unzipped.')
+            file_names = self.files
+
+        if workers <= 1:
+            for file_name in file_names:
+                root_logger.debug(f'{file_name} is unzipping...')
+                try:
+                    result = UnZip.timed_extract(
+                        self.zips_path, file_name, self.member_filter, self.content_store
+                    )
+                    self.unzipped(file_name, *result)
+                except Exception:
+                    self.unzip_failed(file_name)
+            self.finish()
+            return
+
+        # Extraction runs in the worker processes, every result is recorded
+        # as soon as it is done, also while waiting for more names. At most
+        # 2 archives per worker are submitted ahead
+        in_flight = threading.BoundedSemaphore(2 * workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_name in file_names:
+                in_flight.acquire()
+                future = executor.submit(
+                    UnZip.timed_extract,
+                    self.zips_path,
+                    file_name,
+                    self.member_filter,
+                    self.content_store,
+                )
+                future.add_done_callback(partial(self.record, file_name=file_name))
+                future.add_done_callback(lambda _: in_flight.release())
+        self.finish()
+
+    def finish(self):
+        self.save_refreshed_archives()
+        if self.content_store:
+            root_logger.info(
+                f'Deduplication saved {self.saved_bytes / 1048576:.1f} MB.'
+            )
+
+    def record(self, future, file_name):
+        # So the output files only ever have one writer
+        with self.record_lock:
+            if future.exception() is None:
+                self.unzipped(file_name, *future.result())
+            else:
+                self.unzip_failed(file_name)
+
+    @staticmethod
+    def timed_extract(zips_path, file_name, member_filter=None, content_store=None):
+        # Returns the extraction time, measured where the extraction runs, the
+        # bytes deduplication did not write and the files over max_archive_size
+        started_at = time.monotonic()
+        result = UnZip.extract(zips_path, file_name, member_filter, content_store)
+        saved_bytes, skipped_files = result or (0, 0)
+        return time.monotonic() - started_at, saved_bytes, skipped_files
+
+    @staticmethod
+    def extract(zips_path, file_name, member_filter=None, content_store=None):
+        if member_filter is not None or content_store is not None:
+            return UnZip.extract_selected(
+                zips_path, file_name, member_filter, content_store
+            )
+
+        # Extracts into a private folder first, archives of different forks
+        # often share the same top level folder name
+        temp_path = zips_path / f'.{file_name[:-4]}.tmp'
+        if os.path.exists(temp_path):
+            shutil.rmtree(temp_path)
+
+        try:
+            with zipfile.ZipFile(zips_path / str(file_name), 'r') as zip_ref:
+                unzipped_file_name = zip_ref.infolist()[0].filename[:-1]
+                zip_ref.extractall(temp_path)
+            # Folder of an older version of a refreshed archive
+            shutil.rmtree(zips_path / file_name[:-4], ignore_errors=True)
+            UnZip.rename_file(temp_path, unzipped_file_name, zips_path / file_name)
+        finally:
+            shutil.rmtree(temp_path, ignore_errors=True)
+
+    @staticmethod
+    def extract_selected(zips_path, file_name, member_filter=None, content_store=None):
+        # Streams the wanted members (all without a filter) one at a time
+        # straight into the final <owner>_<repo>_N<number> folder, without the
+        # top level folder
+        target_path = zips_path / file_name[:-4]
+        if os.path.exists(target_path):
+            shutil.rmtree(target_path)
+        os.mkdir(target_path)
+
+        written_bytes = 0
+        saved_bytes = 0
+        skipped_files = 0
+        try:
+            with zipfile.ZipFile(zips_path / str(file_name), 'r') as zip_ref:
+                for member in zip_ref.infolist():
+                    if member.is_dir():
+                        continue
+
+                    path = member.filename.split('/', 1)[-1]
+                    parts = path.split('/')
+                    if not path or path.startswith('/') or '..' in parts:
+                        continue
+                    if member_filter is not None:
+                        if not member_filter.is_wanted(path, member.file_size):
+                            continue
+                        # Nothing more is written once a file does not fit,
+                        # the files left are only counted
+                        if skipped_files or (
+                            member_filter.max_archive_size is not None
+                            and written_bytes + member.file_size > member_filter.max_archive_size
+                        ):
+                            skipped_files += 1
+                            continue
+
+                    os.makedirs(target_path.joinpath(*parts[:-1]), exist_ok=True)
+                    if content_store is not None:
+                        saved_bytes += content_store.write(
+                            zip_ref, member, target_path.joinpath(*parts)
+                        )
+                    else:
+                        with zip_ref.open(member) as source:
+                            with open(target_path.joinpath(*parts), 'wb') as target:
+                                shutil.copyfileobj(source, target)
+                    written_bytes += member.file_size
+        except Exception:
+            shutil.rmtree(target_path, ignore_errors=True)
+            raise
+        return saved_bytes, skipped_files
+
+    def unzipped(self, file_name, seconds=None, saved_bytes=0, skipped_files=0):
+        message = f'Unzipped successfully: {file_name[:-4]}'
+        root_logger.info(message)
+        size = os.path.getsize(self.zips_path / file_name)
+        event = {'file': file_name, 'bytes': size}
+        if skipped_files:
+            root_logger.warning(
+                f'{file_name[:-4]} only partly unzipped, {skipped_files} files '
+                'over max_archive_size skipped'
+            )
+            self.metrics.count('unzip_truncated')
+            self.metrics.count('unzip_truncated_files', skipped_files)
+            event['skipped_files'] = skipped_files
+            Utils.save_truncated_archive(file_name, skipped_files)
+        self.metrics.count('unzip_archives')
+        self.metrics.count('unzip_bytes', size)
+        if seconds is not None:
+            self.metrics.observe('unzip_archive', seconds)
+            event['seconds'] = round(seconds, 3)
+        if self.content_store:
+            self.saved_bytes += saved_bytes
+            self.metrics.count('unzip_deduplicated_bytes', saved_bytes)
+            event['saved_bytes'] = saved_bytes
+        self.events.emit('unzip', 'truncated' if skipped_files else 'unzipped', **event)
+        if file_name in self.refreshed:
+            # Listed as unzipped since its first version
+            self.refreshed.discard(file_name)
+        else:
+            UnZip.unzipped_repositories(name=file_name)
+        if self.state_store:
+            self.state_store.mark_unzipped(file_name)
+
+    def unzip_failed(self, file_name):
+        self.metrics.count('unzip_failed')
+        self.events.emit('unzip', 'failed', file=file_name)
+        message = f'File not unzipped properly. {file_name} is Corrupted file!'
+        root_logger.error(f"File unzip failed. Error: {message}")
+        Utils.save_failed_link(file_name)
+        if self.state_store:
+            self.state_store.mark_unzip_failed(file_name)
 
     def get_all_zips(self):
         all_zip_files = set()
-        dir_list = os.listdir(self.zips_path)
-        for file_name in dir_list:
-            if not os.path.isdir(self.zips_path / file_name) and str(file_name)[-4:] == '.zip':
-                all_zip_files.add(file_name)
+        with os.scandir(self.zips_path) as entries:
+            for entry in entries:
+                if not entry.is_dir() and entry.name[-4:] == '.zip':
+                    all_zip_files.add(entry.name)
 
         root_logger.debug(f'\n\nTotal zips are {len(all_zip_files)}')
 
+        if self.state_store:
+            already_unzipped_files = (
+                self.state_store.get_unzipped_file_names() - self.refreshed
+            )
+            return already_unzipped_files, all_zip_files - already_unzipped_files
+
         file_path = BASE_DIR / 'outputs/unzipped_repositories.txt'
 
         if not os.path.exists(file_path):
-            return list(), all_zip_files
+            return set(), all_zip_files
 
         already_unzipped_files = set()
         with open(file_path, 'r') as file:
             for file_name in file.readlines():
                 already_unzipped_files.add(file_name.strip())
+        already_unzipped_files -= self.refreshed
 
         return already_unzipped_files, all_zip_files - already_unzipped_files
 
+    @classmethod
+    def get_refreshed_archives(cls):
+        if not os.path.exists(cls.refreshed_archives_path):
+            return set()
+        with open(cls.refreshed_archives_path, 'r') as file:
+            return {line.strip() for line in file if line.strip()}
+
+    def save_refreshed_archives(self):
+        # Keeps the refreshed archives that are still to be unzipped again
+        if not self.refreshed and not os.path.exists(UnZip.refreshed_archives_path):
+            return
+        with open(UnZip.refreshed_archives_path, 'w') as file:
+            for file_name in sorted(self.refreshed):
+                file.write(f'{file_name}\n')
+
     @classmethod
     def rename_file(cls, base_path, old_file_name, new_file_name):
         old_name = base_path / old_file_name
-        new_name = base_path / new_file_name[:-4]
+        new_name = new_file_name.parent / new_file_name.name[:-4]
         os.rename(old_name, new_name)
-        message = f'Unzipped successfully: {new_file_name[:-4]}'
-        root_logger.info(message)
-        UnZip.unzipped_repositories(name=new_file_name)
 
     @classmethod
     def unzipped_repositories(cls, name):
@@ -91,23 +432,239 @@ class UnZip:
         with open(unzipped_repositories_file_path, 'a') as file:
             file.write(name + '\n')
 
-    def clean_up(self):
+    def clean_up(self, dry_run=False):
+        # Single scandir pass, folders are checked against the set of
+        # already unzipped archive names
         message = 'Cleanup.'
         root_logger.info(message)
 
         folder_path = self.zips_path
-        dir_list = os.listdir(folder_path)
-        for file_name in dir_list:
-            if os.path.isdir(folder_path / str(file_name)) and f'{file_name}.zip' not in self.already_unzipped_files:
-                message = f'Removing file : {file_name}'
-                root_logger.info(message)
-                shutil.rmtree(folder_path / f'{file_name}')
+        store_path = self.content_store.store_path if self.content_store else None
+        orphans = []
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if store_path and pathlib.Path(entry.path) == store_path:
+                    continue
+                if entry.is_dir() and f'{entry.name}.zip' not in self.already_unzipped_files:
+                    orphans.append(entry.name)
+
+        for file_name in orphans:
+            if dry_run:
+                root_logger.info(f'Would remove file : {file_name}')
+                continue
+            message = f'Removing file : {file_name}'
+            root_logger.info(message)
+            shutil.rmtree(folder_path / f'{file_name}')
+
+        action = 'would remove' if dry_run else 'removed'
+        root_logger.info(f'Cleanup {action} {len(orphans)} folders.')
+
+        if self.content_store and not dry_run:
+            removed = self.content_store.prune()
+            root_logger.info(f'Cleanup removed {removed} unused stored files.')
+
+
+class ZipIndex:
+    # Persistent manifest of every member of the downloaded archives (path,
+    # sizes, CRC, local header offset) read from the zip central directories,
+    # plus a read API that serves members straight from the memory-mapped
+    # archive, so repositories can be listed and read without extracting them.
+    default_path = BASE_DIR / 'outputs/zip_index.sqlite3'
+    local_header = struct.Struct('<4s5H3I2H')
+    # Archives kept open and mapped at once, the least recently read is closed
+    max_open_archives = 16
+
+    def __init__(self, zips_input_path, index_path=None):
+        self.zips_path = zips_input_path
+        self.connection = sqlite3.connect(str(index_path or ZipIndex.default_path))
+        # name -> (file, map, size, mtime), least recently read first
+        self.archives = OrderedDict()
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS archives ('
+                'name TEXT PRIMARY KEY, size INTEGER, mtime REAL)'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS members ('
+                'archive TEXT, path TEXT, size INTEGER, compressed_size INTEGER, '
+                'crc INTEGER, header_offset INTEGER, compress_type INTEGER, '
+                'PRIMARY KEY (archive, path))'
+            )
+
+    def build(self):
+        # Only archives that are new or changed since the last build are read
+        rows = self.connection.execute('SELECT name, size, mtime FROM archives')
+        indexed = {name: (size, mtime) for name, size, mtime in rows}
+        count = 0
+        found = set()
+        with os.scandir(self.zips_path) as entries:
+            for entry in entries:
+                if entry.is_dir() or entry.name[-4:] != '.zip':
+                    continue
+                found.add(entry.name)
+                stat = entry.stat()
+                if indexed.get(entry.name) == (stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    self.index_archive(entry.name, stat)
+                    count += 1
+                except zipfile.BadZipFile:
+                    root_logger.error(f'Indexing failed. {entry.name} is Corrupted file!')
+
+        # Archives removed since the last build
+        removed = [(name,) for name in indexed if name not in found]
+        for (name,) in removed:
+            self.close_archive(name)
+        with self.connection:
+            self.connection.executemany('DELETE FROM members WHERE archive = ?', removed)
+            self.connection.executemany('DELETE FROM archives WHERE name = ?', removed)
+        root_logger.info(f'Indexed {count} archives, removed {len(removed)}.')
+
+    def index_archive(self, file_name, stat):
+        with zipfile.ZipFile(self.zips_path / file_name, 'r') as zip_ref:
+            rows = [
+                (
+                    file_name, member.filename, member.file_size, member.compress_size,
+                    member.CRC, member.header_offset, member.compress_type,
+                )
+                for member in zip_ref.infolist()
+                if not member.is_dir()
+            ]
+        with self.connection:
+            self.connection.execute('DELETE FROM members WHERE archive = ?', (file_name,))
+            self.connection.executemany('INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.connection.execute(
+                'INSERT OR REPLACE INTO archives VALUES (?, ?, ?)',
+                (file_name, stat.st_size, stat.st_mtime),
+            )
+
+    def list_files(self, archive, pattern=None):
+        rows = self.connection.execute(
+            'SELECT path, size FROM members WHERE archive = ? ORDER BY path', (archive,)
+        ).fetchall()
+        if pattern:
+            rows = [row for row in rows if fnmatch.fnmatch(row[0], pattern)]
+        return rows
+
+    def get_archive(self, archive):
+        # A refreshed archive is mapped again
+        stat = os.stat(self.zips_path / archive)
+        if archive in self.archives:
+            if self.archives[archive][2:] == (stat.st_size, stat.st_mtime):
+                self.archives.move_to_end(archive)
+                return self.archives[archive][1]
+            self.close_archive(archive)
+
+        while len(self.archives) >= ZipIndex.max_open_archives:
+            self.close_archive(next(iter(self.archives)))
+        file = open(self.zips_path / archive, 'rb')
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            file.close()
+            raise
+        self.archives[archive] = (file, mapped, stat.st_size, stat.st_mtime)
+        return mapped
+
+    def close_archive(self, archive):
+        if archive in self.archives:
+            file, mapped = self.archives.pop(archive)[:2]
+            mapped.close()
+            file.close()
+
+    def read(self, archive, path):
+        row = self.connection.execute(
+            'SELECT compressed_size, crc, header_offset, compress_type '
+            'FROM members WHERE archive = ? AND path = ?',
+            (archive, path),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f'{path} not found in {archive}')
+        compressed_size, crc, header_offset, compress_type = row
+
+        data = self.get_archive(archive)
+        header = ZipIndex.local_header.unpack_from(data, header_offset)
+        start = header_offset + ZipIndex.local_header.size + header[-2] + header[-1]
+        raw = data[start:start + compressed_size]
+
+        if compress_type == zipfile.ZIP_STORED:
+            content = raw
+        elif compress_type == zipfile.ZIP_DEFLATED:
+            content = zlib.decompress(raw, -zlib.MAX_WBITS)
+        else:
+            with zipfile.ZipFile(self.zips_path / archive, 'r') as zip_ref:
+                content = zip_ref.read(path)
+
+        if zlib.crc32(content) != crc:
+            raise zipfile.BadZipFile(f'Bad CRC for {path} in {archive}')
+        return content
+
+    def close(self):
+        for archive in list(self.archives):
+            self.close_archive(archive)
+        self.connection.close()
 
 
 if __name__ == '__main__':
     zips_path = BASE_DIR / 'RepoDownloads'
-    UnZip(zips_input_path=zips_path).run()
-    UnZip(zips_input_path=zips_path).clean_up()
+
+    # Only print which folders the cleanup would remove
+    cleanup_dry_run = False
+
+    # Number of processes extracting archives at the same time
+    unzip_workers = os.cpu_count() or 1
+
+    # Only extract matching files, e.g.
+    # MemberFilter(include=['*.py'], exclude=['node_modules/'],
+    #              max_file_size=1048576, max_archive_size=104857600)
+    # None extracts everything
+    member_filter = None
+
+    # Store identical extracted files once (in RepoDownloads/.objects), the
+    # copies in the repository folders become hardlinks to it
+    deduplicate = False
+    content_store = ContentStore(zips_path / '.objects') if deduplicate else None
+
+    # Only index the archives in outputs/zip_index.sqlite3 instead of unzipping
+    # them, members are then read with ZipIndex.list_files / ZipIndex.read
+    index_only = False
+
+    # Timings and counters, written to outputs/metrics_unzip.json. Set a port to
+    # also serve them at http://127.0.0.1:<port>/metrics (Prometheus)
+    metrics_port = None
+    metrics = Metrics(snapshot_path=BASE_DIR / 'outputs/metrics_unzip.json')
+    metrics.start(port=metrics_port)
+
+    # One JSON line per archive with its duration and size, written to
+    # outputs/events_unzip.jsonl
+    events = EventLog(BASE_DIR / 'outputs/events_unzip.jsonl').start()
+    atexit.register(metrics.stop)
+    atexit.register(events.stop)
+
+    # Read and record progress in the shared SQLite ledger (outputs/state.sqlite3)
+    use_state_store = False
+    state_store = None
+    if use_state_store:
+        state_store = StateStore()
+        state_store.import_text_files()
+
+    unzip_options = dict(
+        cleanup_dry_run=cleanup_dry_run,
+        state_store=state_store,
+        member_filter=member_filter,
+        metrics=metrics,
+        content_store=content_store,
+        events=events,
+    )
+    if index_only:
+        zip_index = ZipIndex(zips_input_path=zips_path)
+        zip_index.build()
+        zip_index.close()
+    else:
+        UnZip(zips_input_path=zips_path, **unzip_options).run(workers=unzip_workers)
+        UnZip(zips_input_path=zips_path, **unzip_options)
+    events.stop()
+    metrics.stop()
 
 
 
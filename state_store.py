@@ -0,0 +1,216 @@
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+
+BASE_DIR = pathlib.Path(__file__).parent.resolve()
+
+
+class StateStore:
+    # Optional SQLite ledger shared by script0, script1 and script2. One row per
+    # collected repository (keyed by its file number) with the status and time
+    # of every stage, so "what is left" and the summaries are indexed queries.
+    # The text files in outputs/ are still written as before.
+    default_path = BASE_DIR / "outputs/state.sqlite3"
+    file_number_pattern = re.compile(r"_N([0-9]+)\.zip$")
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or StateStore.default_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            str(self.db_path), timeout=30, check_same_thread=False
+        )
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS repos (
+                    number INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    collected_at REAL,
+                    download_status TEXT,
+                    downloaded_at REAL,
+                    file_name TEXT,
+                    unzip_status TEXT,
+                    unzipped_at REAL
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS repos_url ON repos (url)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS repos_download ON repos (download_status)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS repos_unzip ON repos (unzip_status)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    @staticmethod
+    def read_lines(file_path):
+        if not os.path.exists(file_path):
+            return []
+        with open(file_path, "r") as file:
+            return [line.strip() for line in file if line.strip()]
+
+    @staticmethod
+    def split_link_line(line):
+        number, url = line.split(" ")[:2]
+        return int(number), url
+
+    @staticmethod
+    def get_file_number(file_name):
+        match = StateStore.file_number_pattern.search(file_name)
+        return int(match.group(1)) if match else None
+
+    def import_text_files(self, outputs_path=None):
+        # Only done for a new database, later runs keep both in sync
+        outputs_path = pathlib.Path(outputs_path or BASE_DIR / "outputs")
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM meta WHERE key = 'imported_text_files'"
+            ).fetchone()
+        if row:
+            return False
+
+        now = time.time()
+        collected = [
+            StateStore.split_link_line(line)
+            for line in StateStore.read_lines(outputs_path / "collected_links.txt")
+        ]
+        failed = [
+            StateStore.split_link_line(line)
+            for line in StateStore.read_lines(outputs_path / "failed_link.txt")
+        ]
+        downloaded = [
+            StateStore.split_link_line(line)
+            for line in StateStore.read_lines(outputs_path / "downloaded_link.txt")
+        ]
+        unzip_failed = StateStore.read_lines(outputs_path / "unzip_failed_link.txt")
+        unzipped = StateStore.read_lines(outputs_path / "unzipped_repositories.txt")
+
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO repos (number, url, collected_at) VALUES (?, ?, ?)",
+                [(number, url, now) for number, url in collected + failed + downloaded],
+            )
+            for status, rows in (("failed", failed), ("downloaded", downloaded)):
+                self.connection.executemany(
+                    "UPDATE repos SET download_status = ?, downloaded_at = ? WHERE number = ?",
+                    [(status, now, number) for number, _ in rows],
+                )
+            for status, file_names in (("failed", unzip_failed), ("unzipped", unzipped)):
+                self.connection.executemany(
+                    "UPDATE repos SET unzip_status = ?, unzipped_at = ?, file_name = ? WHERE number = ?",
+                    [
+                        (status, now, file_name, StateStore.get_file_number(file_name))
+                        for file_name in file_names
+                    ],
+                )
+            self.connection.execute(
+                "INSERT INTO meta (key, value) VALUES ('imported_text_files', ?)",
+                (str(now),),
+            )
+        return True
+
+    def add_collected(self, links):
+        # links: [(number, url), ...]
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT INTO repos (number, url, collected_at) VALUES (?, ?, ?)
+                ON CONFLICT (number) DO UPDATE
+                SET url = excluded.url, collected_at = excluded.collected_at
+                """,
+                [(int(number), url, now) for number, url in links],
+            )
+
+    def mark_downloaded(self, number, url, file_name):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO repos (number, url) VALUES (?, ?)",
+                (int(number), url),
+            )
+            self.connection.execute(
+                "UPDATE repos SET download_status = 'downloaded', downloaded_at = ?, file_name = ? WHERE number = ?",
+                (time.time(), file_name, int(number)),
+            )
+
+    def mark_download_failed(self, number, url):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO repos (number, url) VALUES (?, ?)",
+                (int(number), url),
+            )
+            self.connection.execute(
+                "UPDATE repos SET download_status = 'failed', downloaded_at = ? WHERE number = ?",
+                (time.time(), int(number)),
+            )
+
+    def get_pending_downloads(self):
+        # Same "<number> <url>" lines as Utils.get_starting_links
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT number, url FROM repos WHERE download_status IS NOT 'downloaded' ORDER BY number"
+            ).fetchall()
+        return [f"{number} {url}" for number, url in rows]
+
+    def mark_unzipped(self, file_name):
+        self.set_unzip_status(file_name, "unzipped")
+
+    def mark_unzip_failed(self, file_name):
+        self.set_unzip_status(file_name, "failed")
+
+    def mark_refreshed(self, file_name):
+        # The archive changed, it has to be unzipped again
+        self.set_unzip_status(file_name, None)
+
+    def set_unzip_status(self, file_name, status):
+        number = StateStore.get_file_number(file_name)
+        if number is None:
+            return
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE repos SET unzip_status = ?, unzipped_at = ?, file_name = ? WHERE number = ?",
+                (status, time.time(), file_name, number),
+            )
+
+    def get_unzipped_file_names(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT file_name FROM repos WHERE unzip_status = 'unzipped'"
+            ).fetchall()
+        return {file_name for (file_name,) in rows}
+
+    def get_summary(self):
+        with self.lock:
+            collected = self.connection.execute(
+                "SELECT COUNT(*) FROM repos"
+            ).fetchone()[0]
+            downloads = dict(
+                self.connection.execute(
+                    "SELECT download_status, COUNT(*) FROM repos GROUP BY download_status"
+                ).fetchall()
+            )
+            unzips = dict(
+                self.connection.execute(
+                    "SELECT unzip_status, COUNT(*) FROM repos GROUP BY unzip_status"
+                ).fetchall()
+            )
+        return {
+            "collected": collected,
+            "downloaded": downloads.get("downloaded", 0),
+            "download_failed": downloads.get("failed", 0),
+            "unzipped": unzips.get("unzipped", 0),
+            "unzip_failed": unzips.get("failed", 0),
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()